@@ -1,60 +1,182 @@
+import json
 from datetime import datetime
 from pathlib import Path
 from typing import Any
+from uuid import uuid4
 from zoneinfo import ZoneInfo
 
+from celery import Signature, group
 from celery.result import AsyncResult
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import ValidationError
 from sqlmodel import select
 
 from api.deps import SessionDep
+from core.config import settings
+from models.batch import Batch
 from models.task import Task
 from schemas.git import GitIn
 from utils.celery_worker import celery_app
 from utils.download import download_content
 from utils.git_dump import fetch_git
-from utils.tasks import update_all_tasks_status, update_task_status
+from utils.progress import has_progress, stream_progress
+from utils.tasks import FINAL_STATES, count_batch_statuses, get_findings_page, get_task
 from utils.tokens import token_required
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 
-@router.post("/")
-@token_required
-async def get_dot_git(session: SessionDep, git_in: GitIn, request: Request) -> None:
-    # TODO: add check url
-    path_to_save = Path(__file__).parent.parent.parent / "gits" / git_in.url.split("://")[1]
-    # task = download_content.apply_async(args=[git_in.url, str(path_to_save)])
-    task = fetch_git.apply_async(
+def get_dump_path(url: str) -> Path:
+    """Return the directory a target is dumped to."""
+    return Path(__file__).parent.parent.parent / "gits" / url.split("://")[1]
+
+
+def fetch_git_signature(git_in: GitIn, task_id: str | None = None) -> Signature:
+    """Return the fetch_git call dumping a target."""
+    return fetch_git.signature(
         args=[
             git_in.url,
-            str(path_to_save),
+            str(get_dump_path(git_in.url)),
             int(10),
             int(3),
             int(3),
             None,
             None,
-        ]
+        ],
+        kwargs={
+            "http_backend": git_in.http_backend,
+            "http2": git_in.http2,
+            "pack_objects": git_in.pack_objects,
+            "scanner": git_in.scanner,
+            "refresh": git_in.refresh,
+        },
+        task_id=task_id,
     )
 
+
+def parse_bulk_target(item: object) -> GitIn:
+    """Return the target of a bulk item, a bare URL or a GitIn object."""
+    try:
+        git_in = GitIn(url=item) if isinstance(item, str) else GitIn.model_validate(item)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors()) from e
+    if "://" not in git_in.url:
+        raise HTTPException(status_code=422, detail=f"Invalid url: {git_in.url}")
+    return git_in
+
+
+def parse_ndjson_line(line: bytes) -> GitIn:
+    try:
+        item = json.loads(line)
+    except json.JSONDecodeError:
+        item = line.decode().strip()
+    return parse_bulk_target(item)
+
+
+async def read_bulk_targets(request: Request) -> list[GitIn]:
+    """Parse a bulk submission, either a JSON list or an NDJSON stream read line by line."""
+    if "ndjson" in request.headers.get("Content-Type", ""):
+        targets = []
+        buffer = b""
+        async for chunk in request.stream():
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            targets.extend(parse_ndjson_line(line) for line in lines if line.strip())
+        if buffer.strip():
+            targets.append(parse_ndjson_line(buffer))
+        return targets
+
+    try:
+        items = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}") from e
+    if isinstance(items, dict):
+        items = items.get("urls", [])
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Expected a list of targets")
+    return [parse_bulk_target(item) for item in items]
+
+
+@router.post("/")
+@token_required
+async def get_dot_git(session: SessionDep, git_in: GitIn, request: Request) -> None:
+    # TODO: add check url
+    path_to_save = get_dump_path(git_in.url)
+    # the row is written before dispatch, the worker signals update it
+    task_id = str(uuid4())
+
     new_task = Task(
-        task_id=task.id,
+        task_id=task_id,
         status="PENDING",
         result=str(path_to_save),
         user=request.headers.get("Authorization"),
         url=git_in.url,
         path="",
-        leaks=[],
     )
     session.add(new_task)
     await session.commit()
     await session.refresh(new_task)
+    fetch_git_signature(git_in, task_id).apply_async()
     return new_task
 
 
+@router.post("/bulk")
+@token_required
+async def bulk_dot_git(session: SessionDep, request: Request) -> dict[str, Any]:
+    """Submit many targets at once as a JSON list or NDJSON of URLs or GitIn objects."""
+    targets = await read_bulk_targets(request)
+    if not targets:
+        raise HTTPException(status_code=400, detail="No targets")
+
+    user = request.headers.get("Authorization")
+    batch = Batch(user=user, total=len(targets))
+    signatures = []
+    new_tasks = []
+    for git_in in targets:
+        # task ids are generated here so the rows are written before dispatch
+        task_id = str(uuid4())
+        signatures.append(fetch_git_signature(git_in, task_id))
+        new_tasks.append(
+            Task(
+                task_id=task_id,
+                status="PENDING",
+                result=str(get_dump_path(git_in.url)),
+                user=user,
+                url=git_in.url,
+                path="",
+                batch_id=batch.id,
+            ),
+        )
+    session.add(batch)
+    session.add_all(new_tasks)
+    await session.commit()
+
+    for start in range(0, len(signatures), settings.BULK_DISPATCH_SIZE):
+        group(signatures[start : start + settings.BULK_DISPATCH_SIZE]).apply_async()
+
+    return {"batch_id": batch.id, "total": batch.total}
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch_status(session: SessionDep, batch_id: str) -> dict[str, Any]:
+    batch: Batch | None = await session.get(Batch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    statuses = await count_batch_statuses(session, batch_id)
+    finished = sum(count for status, count in statuses.items() if status in FINAL_STATES)
+    return {
+        "batch_id": batch.id,
+        "created_at": batch.created_at,
+        "total": batch.total,
+        "finished": finished,
+        "progress": finished / batch.total if batch.total else 1.0,
+        "statuses": statuses,
+    }
+
+
 # @router.get("/status/{task_id}")
 # async def get_status(task_id: str) -> dict[str, str]:
 #     task_result = download_content.AsyncResult(task_id)
@@ -70,10 +192,37 @@ async def get_dot_git(session: SessionDep, git_in: GitIn, request: Request) -> N
 
 @router.get("/status/{task_id}")
 async def get_status(session: SessionDep, task_id: str):
-    task_in_db = await update_task_status(session, task_id)
+    task_in_db = await get_task(session, task_id)
     return task_in_db
 
 
+def progress_response(task_id: str | None = None) -> StreamingResponse:
+    return StreamingResponse(
+        stream_progress(settings.PROGRESS_REDIS or settings.CELERY_BROKER, task_id, settings.PROGRESS_WAIT_TIMEOUT),
+        media_type="text/event-stream",
+        # no buffering by nginx, events have to reach the dashboards as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/progress")
+async def get_all_progress() -> StreamingResponse:
+    """Stream the progress of every running dump over Server-Sent Events."""
+    return progress_response()
+
+
+@router.get("/progress/{task_id}")
+async def get_progress(session: SessionDep, task_id: str) -> StreamingResponse:
+    """Stream the progress of a dump over Server-Sent Events until it finishes."""
+    task_in_db = await get_task(session, task_id)
+    # the snapshot of a finished task expires, there is nothing left to stream
+    if task_in_db.status in FINAL_STATES and not await has_progress(
+        settings.PROGRESS_REDIS or settings.CELERY_BROKER, task_id,
+    ):
+        raise HTTPException(status_code=404, detail="Progress not found")
+    return progress_response(task_id)
+
+
 @router.get("/html", response_class=HTMLResponse)
 async def html(request: Request):
     return templates.TemplateResponse("git.html", {"request": request})
@@ -81,17 +230,61 @@ async def html(request: Request):
 
 @router.get("/tasks")
 async def tasks(session: SessionDep, request: Request):
-    statement = select(Task)
+    statement = select(Task).order_by(Task.created_at.desc())
     result = await session.execute(statement)
     tasks = result.scalars().all()
 
-    # Update status for all tasks
-    await update_all_tasks_status(session, tasks)
-
     return templates.TemplateResponse("tasks.html", {"request": request, "tasks": tasks})
 
 
+@router.get("/task/{task_id}/findings")
+async def task_findings(  # noqa: PLR0913
+    session: SessionDep,
+    task_id: str,
+    after: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    rule: str | None = None,
+    file: str | None = None,
+) -> dict[str, Any]:
+    await get_task(session, task_id)
+    findings, next_after = await get_findings_page(session, task_id, after, limit, rule, file)
+    return {"items": findings, "next": next_after}
+
+
+@router.get("/task/{task_id}/findings/artifact")
+async def task_findings_artifact(session: SessionDep, task_id: str) -> FileResponse:
+    """Stream every finding of a task as JSON lines, straight from its gzipped artifact."""
+    task_in_db: Task = await get_task(session, task_id)
+    if not task_in_db.findings_artifact or not Path(task_in_db.findings_artifact).is_file():
+        raise HTTPException(status_code=404, detail="Findings artifact not found")
+    return FileResponse(
+        task_in_db.findings_artifact,
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "gzip"},
+    )
+
+
 @router.get("/task/{task_id}")
-async def task_table(session: SessionDep, request: Request, task_id: str):
-    task_in_db: Task | None = await update_task_status(session, task_id)
-    return templates.TemplateResponse("leak.html", {"request": request, "leaks": task_in_db.leaks})
+async def task_table(  # noqa: PLR0913
+    session: SessionDep,
+    request: Request,
+    task_id: str,
+    after: str | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    rule: str | None = None,
+    file: str | None = None,
+) -> HTMLResponse:
+    task_in_db: Task = await get_task(session, task_id)
+    findings, next_after = await get_findings_page(session, task_id, after, limit, rule, file)
+    return templates.TemplateResponse(
+        "leak.html",
+        {
+            "request": request,
+            "task": task_in_db,
+            "leaks": findings,
+            "next": next_after,
+            "limit": limit,
+            "rule": rule or "",
+            "file": file or "",
+        },
+    )
@@ -20,6 +20,32 @@ class Settings(BaseSettings):
     POSTGRES_SERVER: str
     POSTGRES_PORT: int = 5432
     POSTGRES_DB: str = ""
+    SCAN_CACHE_PATH: str = "gits/.scan_cache.sqlite"
+    SCAN_CACHE_MAX_ENTRIES: int = 1_000_000
+    OBJECT_STORE_PATH: str = "gits/.object_store"
+    OBJECT_STORE_QUOTA: int = 10 * 1024**3
+    BULK_DISPATCH_SIZE: int = 1000
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REDIS: str = ""
+    RATE_LIMIT_RATE: float = 10.0
+    RATE_LIMIT_BURST: int = 20
+    RATE_LIMIT_MAX_IN_FLIGHT: int = 10
+    RATE_LIMIT_MAX_WAIT: float = 30.0
+    RATE_LIMIT_MAX_BACKOFF: float = 300.0
+    RATE_LIMIT_LEASE_TTL: float = 600.0
+    RATE_LIMIT_MAX_RETRIES: int = 20
+    PROGRESS_REDIS: str = ""
+    PROGRESS_INTERVAL: float = 1.0
+    PROGRESS_WAIT_TIMEOUT: float = 300.0
+    METRICS_PORT: int = 9100
+    METRICS_MULTIPROC_DIR: str = ""
+    FRONTIER_MAX_IN_MEMORY: int = 1_000_000
+    DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024
+    DOWNLOAD_RESUME_ATTEMPTS: int = 3
+    MIRROR_MAX_DEPTH: int = 10
+    MIRROR_MAX_BYTES: int = 1024**3
+    ARTIFACTS_PATH: str = "gits/.artifacts"
+    ARTIFACTS_MAX_AGE: int = 30 * 24 * 60 * 60
 
     @computed_field  # type: ignore[misc]
     @property
@@ -33,5 +59,17 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    @computed_field  # type: ignore[misc]
+    @property
+    def SQLALCHEMY_SYNC_DATABASE_URI(self) -> PostgresDsn:  # noqa: N802
+        return MultiHostUrl.build(
+            scheme="postgresql+psycopg",
+            username=self.POSTGRES_USER,
+            password=self.POSTGRES_PASSWORD,
+            host=self.POSTGRES_SERVER,
+            port=self.POSTGRES_PORT,
+            path=self.POSTGRES_DB,
+        )
+
 
 settings = Settings()
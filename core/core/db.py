@@ -1,5 +1,9 @@
+from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from core.config import settings
 
 engine = create_async_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+
+# used by the celery worker signals, which run outside of any event loop
+sync_engine = create_engine(str(settings.SQLALCHEMY_SYNC_DATABASE_URI), pool_pre_ping=True)
@@ -1,8 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 
 from api.main import api_router
 from core.config import settings
 from middlewares.tokens import TokenAuthMiddleware
+from utils.metrics import render_metrics
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -12,3 +13,12 @@ app = FastAPI(
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 # app.add_middleware(TokenAuthMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Expose the dumper metrics written by the worker processes."""
+    if not settings.METRICS_MULTIPROC_DIR:
+        return Response(status_code=404)
+    content, media_type = render_metrics(settings.METRICS_MULTIPROC_DIR)
+    return Response(content, media_type=media_type)
@@ -1,3 +1,5 @@
+from models.batch import Batch
+from models.finding import Finding
 from models.task import Task
 
-metadata = [Task.metadata]
+metadata = [Task.metadata, Batch.metadata, Finding.metadata]
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlmodel import Field, MetaData
+
+from models.base import BaseModel
+
+
+class Batch(BaseModel, table=True):
+    metadata = MetaData()
+    __tablename__ = "batches"
+
+    user: str = Field(index=True)
+    total: int
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,36 @@
+from sqlmodel import JSON, Column, Field, Index, MetaData
+
+from models.base import BaseModel
+
+
+class Finding(BaseModel, table=True):
+    metadata = MetaData()
+    __tablename__ = "findings"
+    # keyset pagination of the findings of a task, optionally filtered
+    __table_args__ = (
+        Index("ix_findings_task_id_id", "task_id", "id"),
+        Index("ix_findings_task_id_rule_id_id", "task_id", "rule_id", "id"),
+        Index("ix_findings_task_id_file_id", "task_id", "file", "id"),
+    )
+
+    task_id: str
+    rule_id: str = Field(index=True)
+    description: str = ""
+    file: str = Field(index=True)
+    symlink_file: str = ""
+    commit: str = ""
+    start_line: int = 0
+    end_line: int = 0
+    start_column: int = 0
+    end_column: int = 0
+    match: str = ""
+    secret: str = ""
+    secret_hash: str = Field(index=True)
+    entropy: float = 0.0
+    author: str = ""
+    email: str = ""
+    date: str = ""
+    message: str = ""
+    fingerprint: str = ""
+
+    tags: list[str] = Field(sa_column=Column(JSON), default=[])
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlmodel import JSON, Column, Field, MetaData
+from sqlmodel import Field, MetaData
 
 from models.base import BaseModel
 
@@ -16,5 +16,6 @@ class Task(BaseModel, table=True):
     user: str = Field(index=True)
     url: str = Field(index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
-
-    leaks: list[dict] = Field(sa_column=Column(JSON), default=[])
+    batch_id: str | None = Field(default=None, index=True)
+    findings_count: int = 0
+    findings_artifact: str | None = None
@@ -1,5 +1,12 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
 class GitIn(BaseModel):
     url: str
+    http_backend: Literal["requests", "httpx"] = "requests"
+    http2: bool = False
+    pack_objects: bool = False
+    scanner: Literal["gitleaks", "native"] = "gitleaks"
+    refresh: bool = False
@@ -0,0 +1,173 @@
+"""Benchmark the dumper against synthetic repositories served from a local web server.
+
+Run as `python -m tests.benchmark --commits 200 --files 100 --jobs 10` from core.
+
+Exits with status 1 if a scenario does not produce the dump it expects.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from tests.benchmark.repo import LAYOUTS, SECRET_INTERVAL, generate_repo
+from tests.benchmark.runner import run_scenario
+from tests.benchmark.server import BenchmarkServer, ServerConfig
+
+SCENARIOS = {
+    "listing": ServerConfig(listing=True),
+    "no-listing": ServerConfig(),
+    "packs-only": ServerConfig(packs_only=True),
+    "latency": ServerConfig(latency=0.02),
+    "noise-404": ServerConfig(noise_404=0.1),
+    "soft-404": ServerConfig(soft_404=True),
+}
+
+# scenarios whose dump may lack objects, the others must fetch every object of the repository
+INCOMPLETE_SCENARIOS = {"noise-404"}
+
+# the settings of the app are required, none of these services is contacted
+DEFAULT_ENV = {
+    "PROJECT_NAME": "benchmark",
+    "VERSION": "0",
+    "CELERY_BROKER": "memory://",
+    "CELERY_BACKEND": "cache+memory://",
+    "POSTGRES_USER": "benchmark",
+    "POSTGRES_PASSWORD": "benchmark",
+    "POSTGRES_SERVER": "127.0.0.1",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--files", type=int, default=50, help="files in the tree")
+    parser.add_argument("--changes", type=int, default=5, help="files rewritten by each commit")
+    parser.add_argument("--blob-size", type=int, default=2048)
+    parser.add_argument("--layout", choices=LAYOUTS, default="mixed")
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--scanner", choices=("gitleaks", "native"), default=None)
+    parser.add_argument("--latency", type=float, default=None, help="seconds added to every response")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="default: all")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the generated repositories and dumps")
+    return parser.parse_args()
+
+
+def run(args: argparse.Namespace, workdir: str) -> dict[str, dict[str, Any]]:
+    repos = {}
+    repo_objects = {}
+    results = {}
+    context = multiprocessing.get_context("spawn")
+
+    for name in args.scenario or list(SCENARIOS):
+        config = SCENARIOS[name]
+        if args.latency is not None and name == "latency":
+            config = ServerConfig(latency=args.latency)
+        # loose objects are never served in packs-only mode
+        layout = "packed" if config.packs_only else args.layout
+        if layout not in repos:
+            start = time.perf_counter()
+            path = Path(workdir, f"repo-{layout}")
+            objects = generate_repo(path, args.commits, args.files, args.changes, args.blob_size, layout)
+            repos[layout] = path
+            repo_objects[layout] = objects
+            elapsed = time.perf_counter() - start
+            print(f"Generated {layout} repository: {objects} objects in {elapsed:.1f}s", file=sys.stderr)
+
+        server = BenchmarkServer(repos[layout], config)
+        server.start()
+        scenario_dir = Path(workdir, name)
+        queue = context.Queue()
+        process = context.Process(
+            target=run_scenario,
+            args=(server.url, str(scenario_dir / "dump"), str(scenario_dir), args.jobs, args.scanner, queue),
+        )
+        try:
+            process.start()
+            result = queue.get()
+            process.join()
+        finally:
+            server.stop()
+
+        result["requests"] = server.requests
+        result["expected_objects"] = repo_objects[layout]
+        result["objects_per_second"] = result["objects"] / result["wall"] if result["wall"] else 0.0
+        results[name] = result
+        print(f"Finished {name}: {result['status']} in {result['wall']:.2f}s", file=sys.stderr)
+    return results
+
+
+def print_table(results: dict[str, dict[str, Any]]) -> None:
+    print(
+        f"{'scenario':<12} {'status':<8} {'objects':>8} {'wall s':>8} {'obj/s':>9} "
+        f"{'requests':>9} {'peak MB':>8} {'scan s':>7} {'leaks':>6}",
+    )
+    for name, result in results.items():
+        scan = sum(result["phases"].get(phase, 0.0) for phase in ("gitleaks", "native_scan"))
+        print(
+            f"{name:<12} {result['status']:<8} {result['objects']:>8} {result['wall']:>8.2f} "
+            f"{result['objects_per_second']:>9.1f} {result['requests']:>9} {result['peak_rss_mb']:>8.1f} "
+            f"{scan:>7.2f} {result['leaks']:>6}",
+        )
+    for name, result in results.items():
+        if result["error"]:
+            print(f"{name}: {result['error']}", file=sys.stderr)
+
+
+def check_results(results: dict[str, dict[str, Any]], planted_secrets: int) -> list[str]:
+    """Return the failures of the scenarios, a dump that is not what its scenario expects is a regression."""
+    failures = []
+    for name, result in results.items():
+        if result["status"] != "success":
+            failures.append(f"{name}: status {result['status']}")
+            continue
+        if name in INCOMPLETE_SCENARIOS:
+            if not 0 < result["objects"] <= result["expected_objects"]:
+                failures.append(f"{name}: {result['objects']} of {result['expected_objects']} objects")
+            continue
+        if result["objects"] != result["expected_objects"]:
+            failures.append(f"{name}: {result['objects']} of {result['expected_objects']} objects")
+        if result["missing_objects"] != 0:
+            failures.append(f"{name}: {result['missing_objects']} missing objects")
+        if planted_secrets and not result["leaks"]:
+            failures.append(f"{name}: none of the {planted_secrets} planted secrets found")
+    return failures
+
+
+def main() -> None:
+    args = parse_args()
+    for key, value in DEFAULT_ENV.items():
+        os.environ.setdefault(key, value)
+    if args.scanner is None:
+        args.scanner = "gitleaks" if shutil.which("gitleaks") else "native"
+
+    workdir = tempfile.mkdtemp(prefix="git-analyzer-benchmark-")
+    try:
+        results = run(args, workdir)
+    finally:
+        if args.keep:
+            print(f"Kept {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    failures = check_results(results, len(range(0, args.commits, SECRET_INTERVAL)))
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import random
+import time
+from pathlib import Path
+
+import dulwich.index
+import dulwich.objects
+import dulwich.repo
+import dulwich.server
+
+LAYOUTS = ("loose", "packed", "mixed")
+
+# planted every SECRET_INTERVAL commits so the secret scanners have something to report
+SECRET_INTERVAL = 25
+SECRET = b"aws_access_key_id = AKIA%016d\n"
+
+
+def random_text(rng: random.Random, size: int) -> bytes:
+    """Return printable random content, binary blobs would be skipped by the scanners."""
+    data = rng.randbytes(max(1, size // 2)).hex().encode()
+    return b"\n".join(data[i : i + 64] for i in range(0, len(data), 64)) + b"\n"
+
+
+def build_tree(files: dict[bytes, bytes], objects: list[dulwich.objects.ShaFile]) -> bytes:
+    """Build the nested trees of {path: blob id}, add them to objects and return the root tree id."""
+    tree = dulwich.objects.Tree()
+    subdirs = {}
+    for path, blob_id in files.items():
+        name, _, rest = path.partition(b"/")
+        if rest:
+            subdirs.setdefault(name, {})[rest] = blob_id
+        else:
+            tree.add(name, 0o100644, blob_id)
+    for name, subfiles in subdirs.items():
+        tree.add(name, 0o040000, build_tree(subfiles, objects))
+    objects.append(tree)
+    return tree.id
+
+
+def generate_history(
+    rng: random.Random,
+    commits: int,
+    files: int,
+    changes: int,
+    blob_size: int,
+) -> tuple[list[dulwich.objects.ShaFile], list[int], bytes | None]:
+    """Return the objects of a synthetic history, how many of them precede each commit, and the last commit id."""
+    objects = []
+    history = []
+    tree_files = {}
+    parent = None
+    commit_time = int(time.time()) - commits * 60
+
+    for i in range(files):
+        blob = dulwich.objects.Blob.from_string(random_text(rng, blob_size))
+        objects.append(blob)
+        tree_files[f"dir{i % 10}/file{i}.txt".encode()] = blob.id
+
+    for n in range(commits):
+        changed = rng.sample(range(files), min(changes, files))
+        if n % SECRET_INTERVAL == 0 and 0 not in changed:
+            changed.append(0)
+        for i in changed:
+            content = random_text(rng, blob_size)
+            if n % SECRET_INTERVAL == 0 and i == 0:
+                content += SECRET % n
+            blob = dulwich.objects.Blob.from_string(content)
+            objects.append(blob)
+            tree_files[f"dir{i % 10}/file{i}.txt".encode()] = blob.id
+
+        commit = dulwich.objects.Commit()
+        commit.tree = build_tree(tree_files, objects)
+        commit.parents = [parent] if parent else []
+        commit.author = commit.committer = b"Benchmark <benchmark@example.com>"
+        commit.author_time = commit.commit_time = commit_time + n * 60
+        commit.author_timezone = commit.commit_timezone = 0
+        commit.encoding = b"UTF-8"
+        commit.message = f"Commit {n}\n".encode()
+        objects.append(commit)
+        history.append(len(objects))
+        parent = commit.id
+
+    return objects, history, parent
+
+
+def packed_objects(
+    objects: list[dulwich.objects.ShaFile],
+    history: list[int],
+    layout: str,
+) -> list[dulwich.objects.ShaFile]:
+    """Return the objects to store in a pack for the layout, each of them once."""
+    if layout == "loose":
+        return []
+    if layout == "packed":
+        return list({obj.id: obj for obj in objects}.values())
+    split = history[len(history) // 2] if history else 0
+    return list({obj.id: obj for obj in objects[:split]}.values())
+
+
+def generate_repo(  # noqa: PLR0913
+    path: str | Path,
+    commits: int = 100,
+    files: int = 50,
+    changes: int = 5,
+    blob_size: int = 1024,
+    layout: str = "mixed",
+    seed: int = 0,
+) -> int:
+    """Create a synthetic repository with a working tree at path and return its number of objects.
+
+    Each commit rewrites `changes` of the `files` files with random content of
+    about `blob_size` bytes. With the "mixed" layout the first half of the
+    history is packed and the rest is left as loose objects.
+    """
+    if layout not in LAYOUTS:
+        msg = f"Unknown layout {layout!r}, expected one of {', '.join(LAYOUTS)}"
+        raise ValueError(msg)
+
+    rng = random.Random(seed)  # noqa: S311
+    repo = dulwich.repo.Repo.init(str(path), mkdir=True)
+    objects, history, parent = generate_history(rng, commits, files, changes, blob_size)
+
+    # duplicated trees and blobs are only stored once
+    unique = {obj.id: obj for obj in objects}
+    packed = packed_objects(objects, history, layout)
+    packed_ids = {obj.id for obj in packed}
+
+    if packed:
+        repo.object_store.add_objects([(obj, None) for obj in packed])
+    for obj in unique.values():
+        if obj.id not in packed_ids:
+            repo.object_store.add_object(obj)
+
+    repo.refs[b"refs/heads/master"] = parent
+    dulwich.index.build_index_from_tree(repo.path, repo.index_path(), repo.object_store, repo[parent].tree)
+    # .git/info/refs and .git/objects/info/packs, as served by dumb HTTP hosts
+    dulwich.server.update_server_info(repo)
+    repo.close()
+    return len(unique)
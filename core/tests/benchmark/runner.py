@@ -0,0 +1,61 @@
+import os
+import resource
+import time
+from multiprocessing.queues import Queue
+from pathlib import Path
+from typing import Any
+
+
+def count_objects(directory: str) -> int:
+    """Return the number of loose and packed objects of a dump."""
+    from utils.git_dump import find_packed_objects
+
+    loose = sum(1 for _ in Path(directory, ".git", "objects").glob("[0-9a-f][0-9a-f]/*"))
+    return loose + len(find_packed_objects(directory))
+
+
+def run_scenario(  # noqa: PLR0913
+    url: str,
+    directory: str,
+    workdir: str,
+    jobs: int,
+    scanner: str,
+    results: Queue[dict[str, Any]],
+) -> None:
+    """Dump url into directory in this process and put its measurements on the results queue.
+
+    Runs in a fresh process, so peak RSS and the phase metrics only cover this dump.
+    """
+    # cold caches, no rate limiting and no progress publishing
+    os.environ["OBJECT_STORE_PATH"] = str(Path(workdir, "object_store"))
+    os.environ["SCAN_CACHE_PATH"] = str(Path(workdir, "scan_cache.sqlite"))
+    os.environ["ARTIFACTS_PATH"] = str(Path(workdir, "artifacts"))
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+    from utils.git_dump import fetch_git
+    from utils.metrics import PHASE_DURATION
+
+    start = time.perf_counter()
+    result = fetch_git.run(url, directory, jobs, 0, 10, None, scanner=scanner)
+    wall = time.perf_counter() - start
+
+    phases = {}
+    for metric in PHASE_DURATION.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_sum"):
+                phases[sample.labels["phase"]] = round(sample.value, 3)
+
+    results.put(
+        {
+            "status": result.get("status"),
+            "error": result.get("path") if result.get("status") != "success" else None,
+            "wall": wall,
+            "objects": count_objects(directory),
+            "leaks": result.get("findings", {}).get("count", 0),
+            "missing_objects": result.get("missing_objects"),
+            # kilobytes on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "phases": phases,
+        },
+    )
@@ -0,0 +1,105 @@
+import functools
+import random
+import re
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+LOOSE_OBJECT = re.compile(r"/\.git/objects/[0-9a-f]{2}/[0-9a-f]{38}$")
+
+SOFT_404_BODY = b"<html><head><title>Page not found</title></head><body><h1>Oops!</h1></body></html>\n"
+
+
+@dataclass
+class ServerConfig:
+    listing: bool = False
+    packs_only: bool = False
+    latency: float = 0.0
+    noise_404: float = 0.0
+    soft_404: bool = False
+    seed: int = 0
+
+
+class ExposedGitHandler(SimpleHTTPRequestHandler):
+    """Serve a working tree and its .git the way a misconfigured web server would."""
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def send_missing(self, *, head: bool = False) -> None:
+        if not self.server.config.soft_404:
+            self.send_error(404)
+            return
+        # answer 200 with an HTML page like many CMS catch-all routes
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(SOFT_404_BODY)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(SOFT_404_BODY)
+
+    def serve(self, *, head: bool = False) -> None:
+        config = self.server.config
+        self.server.count_request()
+        if config.latency:
+            time.sleep(config.latency)
+
+        path = urllib.parse.urlsplit(self.path).path
+        if path.endswith("/") and not config.listing:
+            self.send_error(403)
+            return
+        if (
+            (config.packs_only and LOOSE_OBJECT.search(path))
+            or (config.noise_404 and LOOSE_OBJECT.search(path) and self.server.draw() < config.noise_404)
+            or not Path(self.translate_path(path)).exists()
+        ):
+            self.send_missing(head=head)
+            return
+
+        if head:
+            super().do_HEAD()
+        else:
+            super().do_GET()
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.serve()
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        self.serve(head=True)
+
+
+class BenchmarkServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, root: str | Path, config: ServerConfig, port: int = 0) -> None:
+        """Serve root on 127.0.0.1, on a free port unless one is given."""
+        super().__init__(("127.0.0.1", port), functools.partial(ExposedGitHandler, directory=str(root)))
+        self.config = config
+        self.requests = 0
+        self._rng = random.Random(config.seed)  # noqa: S311
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def draw(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,124 @@
+import json
+import unittest
+from collections.abc import Iterable, Iterator
+from http import HTTPStatus
+from unittest import mock
+
+import httpx
+from celery.canvas import Signature
+from fastapi.testclient import TestClient
+
+from api.deps import get_db
+from api.routes import git
+from core.config import settings
+from main import app
+from models.task import Task
+
+BULK_URL = f"{settings.API_V1_STR}/git/bulk"
+TOKEN = "test-token"  # noqa: S105
+
+
+class FakeSession:
+    """Record the rows written by the route instead of reaching Postgres."""
+
+    def __init__(self) -> None:
+        """Start without rows nor commits."""
+        self.rows = []
+        self.commits = 0
+
+    def add(self, row: object) -> None:
+        self.rows.append(row)
+
+    def add_all(self, rows: Iterable[object]) -> None:
+        self.rows.extend(rows)
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+
+class BulkSubmitTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.session = FakeSession()
+        app.dependency_overrides[get_db] = lambda: self.session
+        self.addCleanup(app.dependency_overrides.clear)
+
+        self.groups = []
+        for patcher in (
+            mock.patch.object(settings, "TOKENS", [TOKEN]),
+            mock.patch.object(settings, "BULK_DISPATCH_SIZE", 2),
+            mock.patch.object(git, "group", side_effect=self.record_group),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(app)
+
+    def record_group(self, signatures: list[Signature]) -> mock.Mock:
+        self.groups.append(signatures)
+        return mock.Mock()
+
+    def submit(
+        self,
+        content: bytes | str | Iterator[bytes],
+        content_type: str = "application/x-ndjson",
+    ) -> httpx.Response:
+        return self.client.post(
+            BULK_URL,
+            content=content,
+            headers={"Authorization": TOKEN, "Content-Type": content_type},
+        )
+
+    def tasks(self) -> list[Task]:
+        return [row for row in self.session.rows if isinstance(row, Task)]
+
+    def test_ndjson_stream(self) -> None:
+        lines = [
+            b"http://one.example\n",
+            json.dumps({"url": "http://two.example", "scanner": "native", "refresh": True}).encode() + b"\n",
+            b"\n",
+            b'"http://three.example"\n',
+            b"http://four.example",
+        ]
+        body = b"".join(lines)
+        # chunks split in the middle of lines, the last line has no newline
+        response = self.submit(iter([body[i : i + 7] for i in range(0, len(body), 7)]))
+        assert response.status_code == HTTPStatus.OK, response.text
+
+        tasks = self.tasks()
+        assert response.json()["total"] == len(tasks)
+        assert [task.url for task in tasks] == [
+            "http://one.example",
+            "http://two.example",
+            "http://three.example",
+            "http://four.example",
+        ]
+        assert {task.batch_id for task in tasks} == {response.json()["batch_id"]}
+        assert self.session.commits == 1
+
+        # dispatched BULK_DISPATCH_SIZE at a time, with the ids of the rows
+        assert [len(signatures) for signatures in self.groups] == [2, 2]
+        signatures = [signature for signatures in self.groups for signature in signatures]
+        assert [signature.options["task_id"] for signature in signatures] == [task.task_id for task in tasks]
+        assert signatures[1].kwargs["scanner"] == "native"
+        assert signatures[1].kwargs["refresh"]
+
+    def test_json_list(self) -> None:
+        response = self.submit(json.dumps({"urls": ["http://one.example"]}), "application/json")
+        assert response.status_code == HTTPStatus.OK, response.text
+        assert [task.url for task in self.tasks()] == ["http://one.example"]
+
+    def test_invalid_line_rejects_the_batch(self) -> None:
+        response = self.submit(b"http://one.example\nnot-a-url\n")
+        assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+        assert self.session.rows == []
+        assert self.groups == []
+
+    def test_empty_submission(self) -> None:
+        assert self.submit(b"\n\n").status_code == HTTPStatus.BAD_REQUEST
+
+    def test_token_required(self) -> None:
+        response = self.client.post(BULK_URL, content=b"http://one.example\n")
+        assert response.status_code == HTTPStatus.FORBIDDEN
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import dulwich.index
+import dulwich.objects
+import dulwich.repo
+
+from utils.checkout import checkout
+
+
+class CheckoutTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self.tmp.name)
+        self.repo = dulwich.repo.Repo.init(self.directory)
+
+    def tearDown(self) -> None:
+        self.repo.close()
+        self.tmp.cleanup()
+
+    def write_index(self, entries: list[tuple[bytes, bytes | None]]) -> None:
+        """Write a .git/index holding the given (path, content) entries, None for a missing object."""
+        index = dulwich.index.Index(str(self.directory / ".git" / "index"), read=False)
+        for path, content in entries:
+            blob = dulwich.objects.Blob.from_string(content or b"missing")
+            if content is not None:
+                self.repo.object_store.add_object(blob)
+            index[path] = dulwich.index.IndexEntry(0, 0, 0, 0, 0o100644, 0, 0, len(blob.data), blob.id)
+        index.write()
+
+    def read(self, path: str) -> bytes:
+        return (self.directory / path).read_bytes()
+
+    def test_unsafe_paths_skipped(self) -> None:
+        self.write_index(
+            [
+                (b"../escaped", b"x"),
+                (b"a/../../escaped", b"x"),
+                (b".git/config", b"[core]\n"),
+                (b"a/.GIT/hooks/post-checkout", b"#!/bin/sh\n"),
+                (b"a/./b", b"x"),
+                (b"ok.txt", b"ok"),
+            ],
+        )
+        written, missing = checkout(self.directory)
+        assert written == 1
+        assert sorted(missing) == [
+            "../escaped",
+            ".git/config",
+            "a/../../escaped",
+            "a/./b",
+            "a/.GIT/hooks/post-checkout",
+        ]
+        assert self.read("ok.txt") == b"ok"
+        assert not (self.directory.parent / "escaped").exists()
+        assert self.read(".git/config") != b"[core]\n"
+
+    def test_missing_object_skipped(self) -> None:
+        self.write_index([(b"gone.txt", None), (b"ok.txt", b"ok")])
+        assert checkout(self.directory) == (1, ["gone.txt"])
+
+    def test_file_directory_conflict_skipped(self) -> None:
+        for jobs in (1, 4):
+            with self.subTest(jobs=jobs):
+                self.write_index([(b"a", b"file"), (b"a/b", b"nested"), (b"c/d", b"ok")])
+                written, missing = checkout(self.directory, jobs)
+                # whichever of a and a/b is written first wins, the other is reported
+                assert (written, len(missing)) == (2, 1)
+                assert missing[0] in ("a", "a/b")
+                assert self.read("c/d") == b"ok"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from utils.listing import parse_listing
+
+NGINX = b"""<html>
+<head><title>Index of /.git/</title></head>
+<body>
+<h1>Index of /.git/</h1><hr><pre><a href="../">../</a>
+<a href="hooks/">hooks/</a>                                             18-Oct-2026 09:12                   -
+<a href="objects/">objects/</a>                                           18-Oct-2026 09:12                   -
+<a href="refs/">refs/</a>                                              18-Oct-2026 09:12                   -
+<a href="HEAD">HEAD</a>                                               18-Oct-2026 09:12                  21
+<a href="config">config</a>                                             18-Oct-2026 09:12                  92
+<a href="description">description</a>                                        18-Oct-2026 09:12                  73
+<a href="my%20notes.txt">my notes.txt</a>                                       18-Oct-2026 09:12                   5
+</pre><hr></body>
+</html>
+"""
+
+APACHE = b"""<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 3.2 Final//EN">
+<html>
+ <head>
+  <title>Index of /.git</title>
+ </head>
+ <body>
+<h1>Index of /.git</h1>
+  <table>
+   <tr><th valign="top"><img src="/icons/blank.gif" alt="[ICO]"></th><th><a href="?C=N;O=D">Name</a></th><th><a href="?C=M;O=A">Last modified</a></th><th><a href="?C=S;O=A">Size</a></th><th><a href="?C=D;O=A">Description</a></th></tr>
+   <tr><th colspan="5"><hr></th></tr>
+<tr><td valign="top"><img src="/icons/back.gif" alt="[PARENTDIR]"></td><td><a href="/">Parent Directory</a></td><td>&nbsp;</td><td align="right">  - </td><td>&nbsp;</td></tr>
+<tr><td valign="top"><img src="/icons/unknown.gif" alt="[   ]"></td><td><a href="HEAD">HEAD</a></td><td align="right">2026-10-18 09:12  </td><td align="right"> 21 </td><td>&nbsp;</td></tr>
+<tr><td valign="top"><img src="/icons/unknown.gif" alt="[   ]"></td><td><a href="config">config</a></td><td align="right">2026-10-18 09:12  </td><td align="right"> 92 </td><td>&nbsp;</td></tr>
+<tr><td valign="top"><img src="/icons/folder.gif" alt="[DIR]"></td><td><a href="objects/">objects/</a></td><td align="right">2026-10-18 09:12  </td><td align="right">  - </td><td>&nbsp;</td></tr>
+<tr><td valign="top"><img src="/icons/folder.gif" alt="[DIR]"></td><td><a href="refs/">refs/</a></td><td align="right">2026-10-18 09:12  </td><td align="right">  - </td><td>&nbsp;</td></tr>
+   <tr><th colspan="5"><hr></th></tr>
+</table>
+<address>Apache/2.4.58 (Ubuntu) Server at example.com Port 80</address>
+</body></html>
+"""  # noqa: E501
+
+IIS = b"""<html><head><title>example.com - /.git/</title></head><body><H1>example.com - /.git/</H1><hr>
+
+<pre><A HREF="/">[To Parent Directory]</A><br><br>10/18/2026  9:12 AM        &lt;dir&gt; <A HREF="/.git/objects/">objects</A><br>10/18/2026  9:12 AM           21 <A HREF="/.git/HEAD">HEAD</A><br></pre><hr></body></html>"""  # noqa: E501
+
+PYTHON = b"""<!DOCTYPE HTML>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Directory listing for /.git/</title>
+</head>
+<body>
+<h1>Directory listing for /.git/</h1>
+<hr>
+<ul>
+<li><a href="HEAD">HEAD</a></li>
+<li><a href="objects/">objects/</a></li>
+</ul>
+<hr>
+</body>
+</html>
+"""
+
+
+class ParseListingTest(unittest.TestCase):
+    base_url = "http://example.com/.git/"
+
+    def test_nginx(self) -> None:
+        flavour, entries = parse_listing(NGINX, self.base_url, "nginx/1.24.0")
+        assert flavour == "nginx"
+        assert entries == ["hooks/", "objects/", "refs/", "HEAD", "config", "description", "my%20notes.txt"]
+
+    def test_apache(self) -> None:
+        flavour, entries = parse_listing(APACHE, self.base_url, "Apache/2.4.58 (Ubuntu)")
+        assert flavour == "apache"
+        assert entries == ["HEAD", "config", "objects/", "refs/"]
+
+    def test_iis(self) -> None:
+        flavour, entries = parse_listing(IIS, self.base_url, "Microsoft-IIS/10.0")
+        assert flavour == "iis"
+        assert entries == ["objects/", "HEAD"]
+
+    def test_python(self) -> None:
+        flavour, entries = parse_listing(PYTHON, "http://example.com/.git")
+        assert flavour == "python"
+        assert entries == ["HEAD", "objects/"]
+
+    def test_parent_and_self_links(self) -> None:
+        page = b"""<html><body>
+        <a href="../">up</a><a href="..">up</a><a href="./">here</a><a href=".">here</a>
+        <a href="refs/../">here</a><a href="refs/../../">up</a><a href="/">root</a>
+        <a href="/.git/">here</a><a href="http://example.com/">root</a><a href="http://other.example/.git/x">away</a>
+        <a href="refs/./heads/">heads</a><a href="HEAD?raw#top">HEAD</a>
+        </body></html>"""
+        flavour, entries = parse_listing(page, self.base_url)
+        assert flavour is None
+        assert entries == ["refs/heads/", "HEAD"]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.metrics import render_metrics
+
+# the workers import utils from core, wherever the tests are run from
+CORE_PATH = Path(__file__).absolute().parent.parent
+
+WORKER = """
+from utils.metrics import DUMPS, PHASE_DURATION
+DUMPS.labels(status="success").inc()
+PHASE_DURATION.labels(phase="checkout").observe(1.5)
+"""
+
+
+class RenderMetricsTest(unittest.TestCase):
+    def test_serves_worker_metrics(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            # two worker processes writing to the shared directory
+            env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": tmp}
+            for _ in range(2):
+                subprocess.run([sys.executable, "-c", WORKER], env=env, check=True, cwd=CORE_PATH)  # noqa: S603
+
+            content, _ = render_metrics(tmp)
+            assert b'git_dump_tasks_total{status="success"} 2.0' in content
+            assert b'git_dump_phase_duration_seconds_count{phase="checkout"} 2.0' in content
+
+
+if __name__ == "__main__":
+    unittest.main()
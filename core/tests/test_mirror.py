@@ -0,0 +1,122 @@
+import tempfile
+import threading
+import unittest
+from collections.abc import Iterator
+from functools import partial
+from http import HTTPStatus
+from pathlib import Path
+
+from utils.download import MirrorBudget, mirror_entry, normalize_entry
+from utils.git_dump import process_tasks
+
+URL = "http://example.com/"
+
+
+def listing(*hrefs: str) -> bytes:
+    links = "\n".join(f'<a href="{href}">{href}</a>' for href in hrefs)
+    return f"<html><body><h1>Index of /</h1><hr><pre>{links}</pre><hr></body></html>".encode()
+
+
+SITE = {
+    "": listing("../", "./", "a/", "a//", "./a/", "a/../a/", "big.bin"),
+    "a/": listing("../", ".", "b/", "f.txt", "../a/"),
+    "a/b/": listing("../../", "c/", "g.txt"),
+    "a/b/c/": listing("h.txt"),
+    "big.bin": b"x" * 4096,
+    "a/f.txt": b"f",
+    "a/b/g.txt": b"g",
+    "a/b/c/h.txt": b"h",
+}
+
+
+class FakeResponse:
+    def __init__(self, url: str, status_code: int, body: bytes, headers: dict[str, str]) -> None:
+        """Answer with the whole body already read."""
+        self.url = url
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+class FakeSite:
+    def __init__(self) -> None:
+        """Serve SITE and record the paths requested."""
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **_kwargs: object) -> FakeResponse:
+        path = url[len(URL) :]
+        with self._lock:
+            self.requests.append(path)
+        if path not in SITE:
+            return FakeResponse(url, HTTPStatus.NOT_FOUND, b"", {})
+        content_type = "text/html" if path.endswith("/") or not path else "application/octet-stream"
+        return FakeResponse(url, HTTPStatus.OK, SITE[path], {"Content-Type": content_type, "Server": "nginx"})
+
+
+class MirrorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def mirror(self, max_depth: int | None = None, max_bytes: int | None = None) -> tuple[FakeSite, MirrorBudget]:
+        site = FakeSite()
+        budget = MirrorBudget(max_bytes)
+        process_tasks(
+            [""],
+            partial(mirror_entry, max_depth=max_depth, budget=budget),
+            site,
+            URL,
+            self.directory,
+            5,
+            jobs=4,
+            phase="mirror",
+        )
+        return site, budget
+
+    def files(self) -> list[str]:
+        return sorted(
+            path.relative_to(self.directory).as_posix() for path in Path(self.directory).rglob("*") if path.is_file()
+        )
+
+    def test_aliases_crawled_once(self) -> None:
+        site, budget = self.mirror()
+        assert sorted(site.requests) == ["", "a/", "a/b/", "a/b/c/", "a/b/c/h.txt", "a/b/g.txt", "a/f.txt", "big.bin"]
+        assert self.files() == ["a/b/c/h.txt", "a/b/g.txt", "a/f.txt", "big.bin"]
+        assert budget.files == len(self.files())
+
+    def test_normalize_entry(self) -> None:
+        assert normalize_entry("a/", "b//c/") == "a/b/c/"
+        assert normalize_entry("a/", "./b") == "a/b"
+        assert normalize_entry("a/", ".") is None
+        assert normalize_entry("a/", "../") is None
+        assert normalize_entry("a/", "b/../") is None
+        assert normalize_entry("a/", "../b/") is None
+        assert normalize_entry("", "../../etc/passwd") is None
+
+    def test_max_depth(self) -> None:
+        site, _ = self.mirror(max_depth=2)
+        assert "a/b/c/" not in site.requests
+        assert self.files() == ["a/b/g.txt", "a/f.txt", "big.bin"]
+
+    def test_byte_budget(self) -> None:
+        _, budget = self.mirror(max_bytes=1024)
+        assert budget.exhausted
+        # big.bin went over the quota and no .part file is left behind
+        assert "big.bin" not in self.files()
+        assert not any(path.endswith(".part") for path in self.files())
+        assert budget.used <= len(SITE["big.bin"]) + len("fgh")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import os
+import tempfile
+import unittest
+from collections.abc import Iterator
+from http import HTTPStatus
+from pathlib import Path
+from unittest import mock
+
+import requests
+from dulwich.objects import Blob
+from dulwich.pack import write_pack
+
+from core.config import settings
+from utils.git_dump import download_file, download_pack_file
+from utils.object_store import SharedObjectStore
+
+PACK = ".git/objects/pack/pack-" + "ab" * 20
+
+
+class FakeResponse:
+    def __init__(self, url: str, status_code: int, body: bytes, headers: dict[str, str] | None = None) -> None:
+        """Answer url with the given body."""
+        self.url = url
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i : i + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+
+class FakeSession:
+    """Serve files from a dict, answering suffix and open ranges like nginx."""
+
+    def __init__(self, files: dict[str, bytes]) -> None:
+        """Serve files, keyed by their path on the host."""
+        self.files = files
+        self.requests = []
+
+    def get(self, url: str, headers: dict[str, str] | None = None, **_: object) -> FakeResponse:
+        self.requests.append((url, headers))
+        path = url.split("/", 3)[3]
+        if path not in self.files:
+            return FakeResponse(url, 404, b"")
+        body = self.files[path]
+        ranges = (headers or {}).get("Range")
+        if ranges is None:
+            return FakeResponse(url, 200, body)
+        start, _, end = ranges.removeprefix("bytes=").partition("-")
+        start = len(body) - int(end) if not start else int(start)
+        if start >= len(body):
+            return FakeResponse(url, 416, b"")
+        return FakeResponse(url, 206, body[start:], {"Content-Range": f"bytes {start}-{len(body) - 1}/{len(body)}"})
+
+
+class DroppingResponse(FakeResponse):
+    """Drop the connection after the first chunk."""
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        yield self.content[:chunk_size]
+        msg = "connection reset"
+        raise requests.ConnectionError(msg)
+
+
+class DroppingSession(FakeSession):
+    """Drop the first full transfer of every file."""
+
+    def __init__(self, files: dict[str, bytes]) -> None:
+        """Serve files, dropping the first full transfer of each."""
+        super().__init__(files)
+        self.dropped = set()
+
+    def get(self, url: str, headers: dict[str, str] | None = None, **kwargs: object) -> FakeResponse:
+        response = super().get(url, headers, **kwargs)
+        if response.status_code == HTTPStatus.OK and url not in self.dropped:
+            self.dropped.add(url)
+            return DroppingResponse(url, HTTPStatus.OK, response.content)
+        return response
+
+
+def make_pack(directory: str, name: str, contents: list[bytes]) -> tuple[bytes, bytes]:
+    """Write a pack of blobs and return its .pack and .idx bytes."""
+    basename = Path(directory, name)
+    write_pack(str(basename), [Blob.from_string(content) for content in contents])
+    return basename.with_suffix(".pack").read_bytes(), basename.with_suffix(".idx").read_bytes()
+
+
+class PackDownloadTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = str(Path(self.tmp.name, "dump"))
+        self.pack, self.idx = make_pack(self.tmp.name, "one", [b"one", b"two"])
+        self.other_pack, self.other_idx = make_pack(self.tmp.name, "other", [b"three"])
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def path(self, filepath: str) -> Path:
+        return Path(self.directory, filepath)
+
+    def test_pack_not_named_after_its_checksum(self) -> None:
+        # dulwich and JGit name packs after their objects, not their trailer
+        session = FakeSession({PACK + ".pack": self.pack, PACK + ".idx": self.idx})
+        assert download_pack_file(session, PACK + ".idx", "http://h", self.directory, 5)
+        assert download_pack_file(session, PACK + ".pack", "http://h", self.directory, 5)
+        assert self.path(PACK + ".pack").is_file()
+
+    def test_corrupted_trailer(self) -> None:
+        session = FakeSession({PACK + ".pack": self.pack[:-1] + b"\0"})
+        assert not download_pack_file(session, PACK + ".pack", "http://h", self.directory, 5)
+        assert not self.path(PACK + ".pack").exists()
+        assert not self.path(PACK + ".pack.part").exists()
+
+    def test_idx_of_another_pack(self) -> None:
+        session = FakeSession({PACK + ".pack": self.pack, PACK + ".idx": self.other_idx})
+        assert download_pack_file(session, PACK + ".pack", "http://h", self.directory, 5)
+        assert not download_pack_file(session, PACK + ".idx", "http://h", self.directory, 5)
+        assert not self.path(PACK + ".idx").exists()
+
+
+class PackResumeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = str(Path(self.tmp.name, "dump"))
+        self.pack, _ = make_pack(self.tmp.name, "one", [os.urandom(4096) for _ in range(16)])
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_resume_after_dropped_connection(self) -> None:
+        session = DroppingSession({PACK + ".pack": self.pack})
+        with mock.patch.object(settings, "DOWNLOAD_CHUNK_SIZE", 1024):
+            assert download_pack_file(session, PACK + ".pack", "http://h", self.directory, 5)
+        # the second request only asked for the bytes after the first chunk
+        assert [headers for _, headers in session.requests] == [None, {"Range": "bytes=1024-"}]
+        assert Path(self.directory, PACK + ".pack").read_bytes() == self.pack
+
+    def test_resume_of_complete_part_file(self) -> None:
+        # the previous attempt got every byte but died before the rename
+        part_path = Path(self.directory, PACK + ".pack.part")
+        part_path.parent.mkdir(parents=True)
+        part_path.write_bytes(self.pack)
+        session = FakeSession({PACK + ".pack": self.pack})
+        assert download_pack_file(session, PACK + ".pack", "http://h", self.directory, 5)
+        assert not part_path.exists()
+
+    def test_unexpected_range_restarts(self) -> None:
+        part_path = Path(self.directory, PACK + ".pack.part")
+        part_path.parent.mkdir(parents=True)
+        part_path.write_bytes(self.pack[:100])
+        # a server that ignores the offset makes the download start over
+        session = mock.Mock()
+        session.get.side_effect = [
+            FakeResponse("http://h", 206, self.pack[50:], {"Content-Range": "bytes 50-"}),
+            FakeResponse("http://h", 200, self.pack),
+        ]
+        assert download_pack_file(session, PACK + ".pack", "http://h", self.directory, 5)
+        assert Path(self.directory, PACK + ".pack").read_bytes() == self.pack
+
+
+class PackStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SharedObjectStore(Path(self.tmp.name, "store"), 1 << 30)
+        self.pack, self.idx = make_pack(self.tmp.name, "one", [b"one", b"two"])
+        self.other_pack, self.other_idx = make_pack(self.tmp.name, "other", [b"three"])
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp.cleanup()
+
+    def dump(self, name: str, files: dict[str, bytes]) -> tuple[Path, FakeSession]:
+        directory = Path(self.tmp.name, name)
+        session = FakeSession(files)
+        for filepath in (PACK + ".idx", PACK + ".pack"):
+            download_file(session, filepath, "http://h", directory, 5, object_store=self.store)
+        return directory, session
+
+    def test_pack_reused_by_trailer(self) -> None:
+        files = {PACK + ".pack": self.pack, PACK + ".idx": self.idx}
+        self.dump("first", files)
+        directory, session = self.dump("second", files)
+        # only the trailers were requested the second time
+        assert all(headers == {"Range": "bytes=-20"} for _, headers in session.requests)
+        assert Path(directory, PACK + ".pack").read_bytes() == self.pack
+
+    def test_same_name_other_pack(self) -> None:
+        # a host serving another pack under the same name gets its own files, not the stored ones
+        self.dump("first", {PACK + ".pack": self.pack, PACK + ".idx": self.idx})
+        directory, _ = self.dump("second", {PACK + ".pack": self.other_pack, PACK + ".idx": self.other_idx})
+        assert Path(directory, PACK + ".pack").read_bytes() == self.other_pack
+        assert Path(directory, PACK + ".idx").read_bytes() == self.other_idx
+
+
+if __name__ == "__main__":
+    unittest.main()
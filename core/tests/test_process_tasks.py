@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from utils import journal as journal_module
+from utils.git_dump import process_tasks
+from utils.journal import CrawlJournal
+from utils.progress import ProgressReporter
+from utils.shaset import ShaSet
+
+DEPTH = 6
+
+
+def crawl(_session: None, task: str, _url: str, _directory: str, _timeout: int) -> list[str]:
+    """Each task discovers its two children, down to DEPTH hex digits."""
+    return [task + "0", task + "1"] if len(task) < DEPTH else []
+
+
+class ProcessTasksTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name + "/dump"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_progress_with_spilled_frontier(self) -> None:
+        progress = ProgressReporter("test", None)
+        initial = ["a", "b", "c", "a"]
+        seen = set()
+        process_tasks(
+            initial,
+            crawl,
+            None,
+            "",
+            self.directory,
+            1,
+            jobs=4,
+            phase="objects",
+            progress=progress,
+            seen=seen,
+            max_in_memory=2,
+        )
+        # two trees of 63 tasks, a is given twice
+        assert len(seen) == 3 * 63
+        assert progress.processed == 3 * 63
+        assert progress.phase == "objects"
+
+    def test_progress_counts_initial_tasks(self) -> None:
+        progress = ProgressReporter("test", None)
+        with mock.patch.object(progress, "set_phase", wraps=progress.set_phase) as set_phase:
+            process_tasks(
+                ["a", "b", "c"],
+                crawl,
+                None,
+                "",
+                self.directory,
+                1,
+                phase="objects",
+                progress=progress,
+                skip={"c"},
+                max_in_memory=1,
+            )
+        set_phase.assert_called_once_with("objects", 2)
+
+    def test_resume_pages_frontier_from_journal(self) -> None:
+        journal = CrawlJournal(self.tmp.name + "/journal.sqlite")
+        self.addCleanup(journal.close)
+        shas = [f"{i:040x}" for i in range(25)]
+        journal.add_tasks("objects", shas)
+        journal.complete_task("objects", shas[0], [])
+
+        done = []
+
+        def fetch(_session: None, task: str, _url: str, _directory: str, _timeout: int) -> list[str]:
+            done.append(task)
+            return []
+
+        progress = ProgressReporter("test", None)
+        with mock.patch.object(journal_module, "LOAD_PAGE_SIZE", 4):
+            process_tasks(
+                [],
+                fetch,
+                None,
+                "",
+                self.directory,
+                1,
+                jobs=2,
+                journal=journal,
+                phase="objects",
+                progress=progress,
+                seen=ShaSet(),
+                max_in_memory=3,
+            )
+        assert sorted(done) == shas[1:]
+        assert journal.is_phase_done("objects")
+
+
+if __name__ == "__main__":
+    unittest.main()
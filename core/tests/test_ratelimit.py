@@ -0,0 +1,96 @@
+import time
+import unittest
+from unittest import mock
+
+import fakeredis
+import pytest
+import redis
+
+from utils.ratelimit import HostLimiter, HostThrottled
+
+# a token every 50ms, less some slack for the timer
+RATE = 20.0
+TOKEN_WAIT = 0.04
+LEASE_TTL = 0.2
+RETRY_AFTER = 2
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict[str, str] | None = None) -> None:
+        """Answer with status_code and headers."""
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class HostLimiterTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = fakeredis.FakeServer()
+        patcher = mock.patch.object(
+            redis.Redis,
+            "from_url",
+            side_effect=lambda *_, **__: fakeredis.FakeRedis(server=self.server),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def limiter(self, **kwargs: float) -> HostLimiter:
+        limiter = HostLimiter("redis://fake", **kwargs)
+        self.addCleanup(limiter.close)
+        return limiter
+
+    def test_burst_then_rate(self) -> None:
+        limiter = self.limiter(rate=RATE, burst=3, max_in_flight=100, max_wait=1.0)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.release("h", limiter.acquire("h"))
+        assert time.monotonic() - start < TOKEN_WAIT
+        # the bucket is empty, the next token comes 50ms later
+        limiter.release("h", limiter.acquire("h"))
+        assert time.monotonic() - start >= TOKEN_WAIT
+
+    def test_rate_beyond_max_wait(self) -> None:
+        limiter = self.limiter(rate=1.0, burst=1, max_wait=0.1)
+        limiter.acquire("h")
+        with pytest.raises(HostThrottled):
+            limiter.acquire("h")
+        # the bucket of another host is untouched
+        assert limiter.acquire("other") is not None
+
+    def test_in_flight_cap_shared_by_limiters(self) -> None:
+        first = self.limiter(rate=1000.0, burst=100, max_in_flight=2, max_wait=0.1)
+        second = self.limiter(rate=1000.0, burst=100, max_in_flight=2, max_wait=0.1)
+        leases = [first.acquire("h"), second.acquire("h")]
+        with pytest.raises(HostThrottled):
+            first.acquire("h")
+        second.release("h", leases[1])
+        assert first.acquire("h") is not None
+
+    def test_lease_expiry(self) -> None:
+        # a worker killed while holding its slot never releases it
+        dead = self.limiter(rate=1000.0, burst=100, max_in_flight=1, lease_ttl=LEASE_TTL)
+        assert dead.acquire("h") is not None
+        limiter = self.limiter(rate=1000.0, burst=100, max_in_flight=1, max_wait=0.1)
+        with pytest.raises(HostThrottled):
+            limiter.acquire("h")
+        limiter.max_wait = 1.0
+        start = time.monotonic()
+        assert limiter.acquire("h") is not None
+        assert time.monotonic() - start > LEASE_TTL / 4
+
+    def test_retry_after(self) -> None:
+        limiter = self.limiter(rate=1000.0, burst=100, max_wait=0.5)
+        limiter.observe("h", FakeResponse(429, {"Retry-After": str(RETRY_AFTER)}))
+        with pytest.raises(HostThrottled) as e:
+            limiter.acquire("h")
+        assert e.value.retry_after > RETRY_AFTER - 0.5
+
+    def test_redis_unavailable(self) -> None:
+        limiter = self.limiter()
+        with mock.patch.object(limiter, "_acquire", side_effect=redis.ConnectionError("down")):
+            assert limiter.acquire("h") is None
+        assert limiter.disabled
+        assert limiter.acquire("h") is None
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import dulwich.repo
+import dulwich.server
+
+from core.config import settings
+from tests.benchmark.repo import generate_repo
+from tests.benchmark.server import BenchmarkServer, ServerConfig
+from utils import git_dump
+from utils.git_dump import fetch_git
+from utils.http import HttpSession
+from utils.journal import CrawlJournal
+
+
+def add_commit(path: str, filename: str, content: bytes) -> set[str]:
+    """Commit one new file like git commit, publish it like a dumb HTTP host and return the new object ids."""
+    Path(path, filename).write_bytes(content)
+    repo = dulwich.repo.Repo(path)
+    repo.stage([filename])
+    commit_id = repo.do_commit(b"Add a file\n", committer=b"Test <test@example.com>")
+    dulwich.server.update_server_info(repo)
+    commit = repo[commit_id]
+    new_objects = {commit_id.decode(), commit.tree.decode(), repo[commit.tree][filename.encode()][1].decode()}
+    repo.close()
+    # Last-Modified has a one second resolution, move the rewritten files forward so they are not answered with a 304
+    for name in ("index", "refs/heads/master", "info/refs", "objects/info/packs"):
+        filepath = Path(path, ".git", name)
+        mtime = filepath.stat().st_mtime + 60
+        os.utime(filepath, (mtime, mtime))
+    return new_objects
+
+
+class DumpJournalTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.repo = str(Path(self.tmp.name, "repo"))
+        generate_repo(self.repo, commits=8, files=6, changes=2, blob_size=256, layout="mixed")
+        self.server = BenchmarkServer(self.repo, ServerConfig())
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.dump = str(Path(self.tmp.name, "dump"))
+
+        for name, value in {
+            "RATE_LIMIT_ENABLED": False,
+            "OBJECT_STORE_PATH": "",
+            "SCAN_CACHE_PATH": str(Path(self.tmp.name, "scan_cache.sqlite")),
+            "ARTIFACTS_PATH": str(Path(self.tmp.name, "artifacts")),
+        }.items():
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def fetch(self, *, refresh: bool = False, fail_after: int | None = None) -> tuple[dict[str, Any], list[str]]:
+        """Dump the served repository and return the result and the objects requested by the objects phase."""
+        requested = []
+
+        def find_objects(session: HttpSession, obj: str, *args: object, **kwargs: object) -> list[str]:
+            if fail_after is not None and len(requested) == fail_after:
+                msg = "worker lost"
+                raise ConnectionError(msg)
+            requested.append(obj)
+            return find_objects.wrapped(session, obj, *args, **kwargs)
+
+        find_objects.wrapped = git_dump.find_objects
+        with mock.patch.object(git_dump, "find_objects", find_objects):
+            result = fetch_git.run(self.server.url, self.dump, 1, 0, 10, None, scanner="native", refresh=refresh)
+        return result, requested
+
+    def test_resume_after_interruption(self) -> None:
+        result, first = self.fetch(fail_after=5)
+        assert result["status"] == "error"
+        journal = CrawlJournal(self.dump + ".journal")
+        assert journal.is_phase_done("refs")
+        assert not journal.is_phase_done("objects")
+        journal.close()
+
+        requests = self.server.requests
+        result, second = self.fetch()
+        assert result["status"] == "success"
+        assert result["missing_objects"] == 0
+        # the objects completed before the interruption are not requested again
+        assert not set(first) & set(second)
+        # nor are the files of the completed phases
+        assert self.server.requests - requests < len(second) + 10
+
+    def test_refresh_fetches_new_objects_only(self) -> None:
+        result, _ = self.fetch()
+        assert result["status"] == "success"
+        new_objects = add_commit(self.repo, "new.txt", b"fresh content\n")
+
+        result, requested = self.fetch(refresh=True)
+        assert result["status"] == "success"
+        assert result["missing_objects"] == 0
+        assert set(requested) == new_objects
+        assert Path(self.dump, "new.txt").read_bytes() == b"fresh content\n"
+
+    def test_finished_dump_starts_over_without_refresh(self) -> None:
+        self.fetch()
+        _, requested = self.fetch()
+        _, refreshed = self.fetch(refresh=True)
+        assert requested
+        assert refreshed == []
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from utils.scan_cache import ScanCache
+
+MAX_ENTRIES = 3
+
+
+class ScanCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name, "scan.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_entries_counted_and_evicted(self) -> None:
+        cache = ScanCache(self.path, max_entries=MAX_ENTRIES)
+        results = [("a" * 40, []), ("b" * 40, [{"RuleID": "r"}])]
+        cache.put_many(results, "v1")
+        # stored again by another worker, not counted twice
+        cache.put_many([("a" * 40, [])], "v1")
+        assert cache.stats()["entries"] == len(results)
+
+        cache.get_many(["b" * 40], "v1")
+        cache.put_many([("c" * 40, []), ("d" * 40, [])], "v1")
+        assert cache.stats()["entries"] == MAX_ENTRIES
+        # the least recently used entry is gone
+        assert set(cache.get_many(["a" * 40, "b" * 40, "c" * 40, "d" * 40], "v1")) == {"b" * 40, "c" * 40, "d" * 40}
+        cache.close()
+
+    def test_entries_shared_by_instances(self) -> None:
+        first = ScanCache(self.path)
+        second = ScanCache(self.path)
+        first.put_many([("a" * 40, [])], "v1")
+        second.put_many([("b" * 40, [])], "v1")
+        assert (first.stats()["entries"], second.stats()["entries"]) == (2, 2)
+        assert second.get_many(["a" * 40], "v2") == {}
+        first.close()
+        second.close()
+
+    def test_cache_without_entry_counter(self) -> None:
+        ScanCache(self.path).close()
+        db = sqlite3.connect(self.path)
+        db.execute("DELETE FROM counters")
+        rows = [("a", "v1", "[]", 0), ("b", "v1", "[]", 0)]
+        db.executemany("INSERT INTO blobs VALUES (?, ?, ?, ?)", rows)
+        db.commit()
+        db.close()
+        cache = ScanCache(self.path)
+        assert cache.stats()["entries"] == len(rows)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import create_engine, select
+from sqlmodel import Session
+
+from models.finding import Finding
+from models.task import Task
+from utils import signals
+from utils.findings import write_findings_artifact
+
+
+class FetchGit:
+    name = "utils.git_dump.fetch_git"
+
+
+class TaskPostrunTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        engine = create_engine(f"sqlite:///{self.tmp.name}/tasks.sqlite")
+        Task.metadata.create_all(engine)
+        Finding.metadata.create_all(engine)
+        self.addCleanup(engine.dispose)
+        patcher = mock.patch.object(signals, "sync_engine", engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = engine
+        with Session(engine) as session:
+            session.add(Task(task_id="t1", path="", status="PENDING", result="", user="u", url="http://x"))
+            session.commit()
+
+    def finish(self, retval: object, state: str = "SUCCESS") -> None:
+        signals.on_task_prerun(sender=FetchGit, task_id="t1")
+        signals.on_task_postrun(sender=FetchGit, task_id="t1", retval=retval, state=state)
+
+    def rows(self) -> tuple[Task, list[Finding]]:
+        with Session(self.engine) as session:
+            task = session.execute(select(Task)).scalars().one()
+            findings = session.execute(select(Finding)).scalars().all()
+            return task, findings
+
+    def test_success_without_findings(self) -> None:
+        # the shape returned by a directory listing dump before it was scanned
+        self.finish({"status": "success", "path": "/dump", "url": "http://x", "missing_objects": 0})
+        task, findings = self.rows()
+        assert task.status == "SUCCESS"
+        assert task.path == "/dump"
+        assert task.findings_count == 0
+        assert task.findings_artifact is None
+        assert findings == []
+
+    def test_redelivered_task_replaces_findings(self) -> None:
+        leaks = [{"RuleID": "aws-access-token", "Secret": f"AKIA{i}", "File": "f"} for i in range(3)]
+        with mock.patch.object(signals.settings, "ARTIFACTS_PATH", self.tmp.name):
+            summary = write_findings_artifact(leaks, "t1")
+        retval = {"status": "success", "path": "/dump", "url": "http://x", "missing_objects": 0, "findings": summary}
+        self.finish(retval)
+        self.finish(retval)
+        task, findings = self.rows()
+        assert task.findings_count == len(leaks)
+        assert task.findings_artifact == str(Path(self.tmp.name, "t1.ndjson.gz"))
+        assert sorted(finding.secret for finding in findings) == ["AKIA0", "AKIA1", "AKIA2"]
+
+    def test_error(self) -> None:
+        self.finish({"status": "error", "path": "boom", "url": ""})
+        task, _ = self.rows()
+        assert task.status == "ERROR"
+        assert task.result == "boom"
+
+
+if __name__ == "__main__":
+    unittest.main()
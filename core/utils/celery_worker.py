@@ -11,6 +11,8 @@ celery_app = Celery(
 )
 
 celery_app.autodiscover_tasks(["utils.download", "utils.git_dump"])
+# task status sync, imported by the worker at startup
+celery_app.conf.imports = ["utils.signals"]
 # celery_app.conf.update(
 #     event_serializer='pickle',
 #     result_serializer='json',
@@ -0,0 +1,127 @@
+import os
+import stat
+import sys
+import threading
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import dulwich.errors
+import dulwich.index
+import dulwich.objects
+import dulwich.repo
+
+# index entries submitted to the pool at once, so a huge index is never queued whole
+BATCH_SIZE = 1000
+
+
+def iter_tree_entries(
+    repo: dulwich.repo.Repo,
+    tree_id: bytes,
+    missing: list[str],
+    prefix: bytes = b"",
+) -> Iterator[tuple[bytes, bytes, int]]:
+    """Yield (path, sha, mode) for every file under the tree, recording missing trees."""
+    try:
+        tree = repo[tree_id]
+    except KeyError:
+        missing.append(prefix.decode(errors="replace") or tree_id.decode())
+        return
+
+    for entry in tree.iteritems():
+        path = prefix + entry.path
+        if stat.S_ISDIR(entry.mode):
+            yield from iter_tree_entries(repo, entry.sha, missing, path + b"/")
+        else:
+            yield path, entry.sha, entry.mode
+
+
+def iter_worktree_entries(directory: Path, missing: list[str]) -> Iterator[tuple[bytes, bytes, int]]:
+    """Yield the (path, sha, mode) to check out, from .git/index or else from the HEAD tree."""
+    index_path = directory / ".git" / "index"
+    if index_path.is_file():
+        yield from dulwich.index.Index(str(index_path)).iterobjects()
+        return
+
+    repo = dulwich.repo.Repo(str(directory))
+    try:
+        try:
+            commit = repo[repo.head()]
+        except KeyError:
+            missing.append("HEAD")
+            return
+        yield from iter_tree_entries(repo, commit.tree, missing)
+    finally:
+        repo.close()
+
+
+def write_blob(abspath: Path, blob: dulwich.objects.Blob, mode: int) -> None:
+    """Write a blob to abspath, replacing a symlink left there instead of following it."""
+    abspath.parent.mkdir(parents=True, exist_ok=True)
+    if abspath.is_symlink():
+        abspath.unlink()
+    with abspath.open("wb") as f:
+        for chunk in blob.as_raw_chunks():
+            f.write(chunk)
+    if mode & stat.S_IXUSR:
+        # chmod +x, like git for executable entries
+        abspath.chmod(abspath.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def checkout(directory: str | Path, jobs: int = 1) -> tuple[int, list[str]]:
+    """Build the working tree of the dump in-process.
+
+    Blobs are inflated and written by `jobs` threads, each with its own Repo
+    since dulwich pack readers are not thread-safe, BATCH_SIZE entries at a
+    time. Entries with unsafe paths, missing or corrupt objects, or paths that
+    conflict with another entry are skipped and reported instead of aborting.
+    Symlinks are written as regular files holding their target, so a crafted
+    tree can never make later entries escape the dump directory.
+    Return the number of files written and the list of paths that were skipped.
+    """
+    local = threading.local()
+    repos = []
+    repos_lock = threading.Lock()
+    missing = []
+    directory = Path(directory).absolute()
+
+    def write_entry(path: bytes, sha: bytes, mode: int) -> bool:
+        if not dulwich.index.validate_path(path, dulwich.index.validate_path_element_default):
+            print(f"Skipping unsafe path {path.decode(errors='replace')!r}", file=sys.stderr)
+            missing.append(path.decode(errors="replace"))
+            return False
+        if stat.S_ISDIR(mode) or dulwich.index.S_ISGITLINK(mode):
+            return False
+
+        if not hasattr(local, "repo"):
+            local.repo = dulwich.repo.Repo(str(directory))
+            with repos_lock:
+                repos.append(local.repo)
+        try:
+            blob = local.repo[sha]
+        except (KeyError, ValueError, zlib.error, dulwich.errors.ObjectFormatException):
+            missing.append(path.decode(errors="replace"))
+            return False
+
+        try:
+            write_blob(directory / os.fsdecode(path), blob, mode)
+        except (NotADirectoryError, IsADirectoryError, FileExistsError) as e:
+            # a crafted index can hold both a/b and a/b/c
+            print(f"Skipping {path.decode(errors='replace')!r}, it conflicts with another entry: {e}", file=sys.stderr)
+            missing.append(path.decode(errors="replace"))
+            return False
+        return True
+
+    written = 0
+    entries = iter_worktree_entries(directory, missing)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            while batch := list(islice(entries, BATCH_SIZE)):
+                written += sum(executor.map(lambda entry: write_entry(*entry), batch))
+    finally:
+        for repo in repos:
+            repo.close()
+
+    return written, missing
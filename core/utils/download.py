@@ -1,52 +1,199 @@
-import os
+import posixpath
+import sys
+import threading
+from contextlib import closing
+from functools import partial
+from http import HTTPStatus
 from pathlib import Path
+from typing import Any
 
-import requests
-from bs4 import BeautifulSoup
+from celery import Task
+
+from core.config import settings
+from utils.git_dump import create_intermediate_dirs, is_html, is_safe_path, printf, process_tasks
+from utils.http import HttpSession, create_session
+from utils.listing import parse_listing
+from utils.metrics import MetricsSession
+from utils.progress import ProgressReporter, ProgressSession
+from utils.ratelimit import HostLimiter, HostThrottled, ThrottledSession
 
 from .celery_worker import celery_app
 
 
+class MirrorBudget:
+    """Byte quota shared by the workers of a mirror job."""
+
+    def __init__(self, max_bytes: int | None) -> None:
+        """Start an empty quota, max_bytes of None or 0 means unlimited."""
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.files = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return bool(self.max_bytes) and self.used >= self.max_bytes
+
+    def skip(self) -> None:
+        with self._lock:
+            self.skipped += 1
+
+    def add_file(self) -> None:
+        with self._lock:
+            self.files += 1
+
+    def consume(self, size: int) -> bool:
+        """Count size bytes, return False once the quota is exceeded."""
+        with self._lock:
+            self.used += size
+            return not self.exhausted
+
+
+def normalize_entry(path: str, entry: str) -> str | None:
+    """Return the canonical path of an entry of the listing at path, None if it is not below it.
+
+    Parent and self links ("..", ".", "a/../") are dropped and aliases such as
+    "a//b" are collapsed, so the seen-set crawls each directory once.
+    """
+    normalized = posixpath.normpath(path + entry)
+    if normalized == "." or not is_safe_path(normalized) or not normalized.startswith(path):
+        return None
+    return normalized + "/" if entry.endswith("/") else normalized
+
+
+def mirror_entry(  # noqa: PLR0913
+    session: HttpSession,
+    path: str,
+    url: str,
+    directory: str,
+    timeout: int,
+    max_depth: int | None = None,
+    budget: MirrorBudget | None = None,
+) -> list[str]:
+    """Download one entry of the mirrored listing and return the entries of a sub-listing."""
+    if budget is not None and budget.exhausted:
+        budget.skip()
+        return []
+
+    with closing(session.get(url + path, allow_redirects=False, stream=True, timeout=timeout)) as response:
+        printf("[-] Fetching %s%s [%d]\n", url, path, response.status_code)
+        if response.status_code != HTTPStatus.OK:
+            return []
+
+        if path.endswith("/") or not path:
+            if not is_html(response):
+                return []
+            _, entries = parse_listing(response.content, response.url, response.headers.get("Server", ""))
+            # the subdirectories of the root are at depth 1, those of a/b/ at depth 3
+            return [
+                entry
+                for entry in map(partial(normalize_entry, path), entries)
+                if entry is not None and (not entry.endswith("/") or not max_depth or entry.count("/") <= max_depth)
+            ]
+
+        abspath = Path(directory, path).absolute()
+        create_intermediate_dirs(str(abspath))
+        part_path = abspath.with_name(abspath.name + ".part")
+        complete = True
+        with part_path.open("wb") as f:
+            for chunk in response.iter_content(settings.DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                if budget is not None and not budget.consume(len(chunk)):
+                    complete = False
+                    break
+
+    if not complete:
+        printf("[-] Byte limit reached, dropping %s%s\n", url, path, file=sys.stderr)
+        part_path.unlink()
+        return []
+    part_path.replace(abspath)
+    if budget is not None:
+        budget.add_file()
+    return []
+
+
 @celery_app.task(bind=True, name="utils.download.download_content")
-def download_content(self, url: str, save_path: str) -> None:  # noqa: ANN001, ARG001
+def download_content(  # noqa: PLR0913
+    self: Task,
+    url: str,
+    save_path: str,
+    jobs: int = 8,
+    timeout: int = 10,
+    max_depth: int | None = None,
+    max_bytes: int | None = None,
+) -> dict[str, Any]:
+    """Mirror a directory listing and everything below it into save_path.
 
-    # Создаем директорию, если она еще не существует
+    The whole site is one job: directories are crawled with a shared
+    seen-set over one pooled session, files are fetched by `jobs` workers,
+    and the crawl stops going deeper than max_depth or past max_bytes.
+    """
+    session = None
+    limiter = None
+    progress = None
+    status = "error"
+    max_depth = settings.MIRROR_MAX_DEPTH if max_depth is None else max_depth
+    budget = MirrorBudget(settings.MIRROR_MAX_BYTES if max_bytes is None else max_bytes)
     try:
-        save_path = Path(save_path.replace(":", "_"))
         # Создаем директорию, если она еще не существует
-        os.makedirs(save_path, exist_ok=True)
-
-        # Загружаем содержимое страницы
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Перебираем все ссылки
-        for link in soup.find_all('a'):
-            href = link.get('href')
-            if not href:
-                continue
-
-            # Полный URL для файла или директории
-            full_url = requests.compat.urljoin(url, href)
-            local_path = os.path.join(save_path, href)
-
-            if href.endswith('/'):
-                # Если ссылка оканчивается на '/', это директория
-                # download_content(str(full_url), local_path)
-                download_content.apply_async(args=[str(full_url), str(local_path)])
-            else:
-                # Это файл, скачиваем его
-                download_file(str(full_url), str(local_path))
-        return {"status": "success", "url": str(url), "path": str(save_path)}
-    except Exception as e:
-        return {"status": "error", "url": str(url), "error": str(e)}
+        save_path = Path(save_path.replace(":", "_"))
+        save_path.mkdir(parents=True, exist_ok=True)
+        url = str(url)
+        if not url.endswith("/"):
+            url += "/"
+
+        session = MetricsSession(create_session(url, jobs=jobs))
 
+        rate_limit_url = settings.RATE_LIMIT_REDIS or settings.CELERY_BROKER
+        if settings.RATE_LIMIT_ENABLED and rate_limit_url.startswith(("redis://", "rediss://", "unix://")):
+            limiter = HostLimiter(
+                rate_limit_url,
+                rate=settings.RATE_LIMIT_RATE,
+                burst=settings.RATE_LIMIT_BURST,
+                max_in_flight=settings.RATE_LIMIT_MAX_IN_FLIGHT,
+                max_wait=settings.RATE_LIMIT_MAX_WAIT,
+                max_backoff=settings.RATE_LIMIT_MAX_BACKOFF,
+                lease_ttl=settings.RATE_LIMIT_LEASE_TTL,
+            )
+            session = ThrottledSession(session, limiter)
 
-def download_file(url: str, save_path: str) -> None:
-    # Получаем файл и сохраняем его
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(save_path, "wb") as file:
-            file.write(response.content)
-    else:
-        print(f"Failed to download {url}")
+        progress_url = settings.PROGRESS_REDIS or settings.CELERY_BROKER
+        if self.request.id and progress_url.startswith(("redis://", "rediss://", "unix://")):
+            progress = ProgressReporter(self.request.id, progress_url, settings.PROGRESS_INTERVAL)
+            session = ProgressSession(session, progress)
+
+        process_tasks(
+            [""],
+            partial(mirror_entry, max_depth=max_depth, budget=budget),
+            session,
+            url,
+            str(save_path),
+            timeout,
+            jobs,
+            phase="mirror",
+            progress=progress,
+        )
+
+        status = "success"
+        return {
+            "status": "success",
+            "url": url,
+            "path": str(save_path),
+            "files": budget.files,
+            "bytes": budget.used,
+            "skipped": budget.skipped,
+        }
+    except HostThrottled as e:
+        status = "retry"
+        raise self.retry(exc=e, countdown=e.retry_after, max_retries=settings.RATE_LIMIT_MAX_RETRIES) from e
+    except Exception as e:  # noqa: BLE001
+        return {"status": "error", "url": str(url), "error": str(e)}
+    finally:
+        if progress is not None:
+            progress.finish(status)
+            progress.close()
+        if session is not None:
+            session.close()
+        if limiter is not None:
+            limiter.close()
@@ -0,0 +1,90 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+from core.config import settings
+
+
+def hash_secret(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def finding_row(task_id: str, leak: dict[str, Any]) -> dict[str, Any]:
+    """Return the findings table row of a gitleaks-shaped finding."""
+    secret = str(leak.get("Secret", ""))
+    return {
+        "id": str(uuid4()),
+        "task_id": task_id,
+        "rule_id": str(leak.get("RuleID", "")),
+        "description": str(leak.get("Description", "")),
+        "file": str(leak.get("File", "")),
+        "symlink_file": str(leak.get("SymlinkFile") or ""),
+        "commit": str(leak.get("Commit") or ""),
+        "start_line": int(leak.get("StartLine") or 0),
+        "end_line": int(leak.get("EndLine") or 0),
+        "start_column": int(leak.get("StartColumn") or 0),
+        "end_column": int(leak.get("EndColumn") or 0),
+        "match": str(leak.get("Match", "")),
+        "secret": secret,
+        "secret_hash": hash_secret(secret),
+        "entropy": float(leak.get("Entropy") or 0.0),
+        "author": str(leak.get("Author") or ""),
+        "email": str(leak.get("Email") or ""),
+        "date": str(leak.get("Date") or ""),
+        "message": str(leak.get("Message") or ""),
+        "fingerprint": str(leak.get("Fingerprint", "")),
+        "tags": list(leak.get("Tags") or []),
+    }
+
+
+def prune_artifacts(directory: str, max_age: int) -> None:
+    """Remove the artifacts last modified more than max_age seconds ago."""
+    if not max_age:
+        return
+    deadline = time.time() - max_age
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith((".ndjson.gz", ".ndjson.gz.part")):
+                continue
+            try:
+                if entry.stat().st_mtime < deadline:
+                    Path(entry.path).unlink()
+            except FileNotFoundError:
+                # removed by another worker
+                pass
+
+
+def write_findings_artifact(leaks: list[dict[str, Any]], name: str) -> dict[str, Any]:
+    """Write the findings as gzipped JSON lines under ARTIFACTS_PATH and return their summary.
+
+    Only the summary goes through the celery result backend, the findings
+    themselves are read back from the artifact.
+    """
+    Path(settings.ARTIFACTS_PATH).mkdir(parents=True, exist_ok=True)
+    prune_artifacts(settings.ARTIFACTS_PATH, settings.ARTIFACTS_MAX_AGE)
+    path = Path(settings.ARTIFACTS_PATH, f"{name}.ndjson.gz").absolute()
+    part_path = path.with_name(path.name + ".part")
+    with gzip.open(part_path, "wt", encoding="utf-8") as f:
+        for leak in leaks:
+            f.write(json.dumps(leak) + "\n")
+    part_path.replace(path)
+    return {
+        "artifact": str(path),
+        "count": len(leaks),
+        "rules": dict(Counter(str(leak.get("RuleID", "")) for leak in leaks)),
+    }
+
+
+def iter_findings_artifact(path: str) -> Iterator[dict[str, Any]]:
+    """Yield the findings of an artifact one at a time."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
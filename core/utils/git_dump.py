@@ -1,27 +1,53 @@
 #!/usr/bin/env python3
+import hashlib
 import os
 import re
-import subprocess
 import sys
 import traceback
-import urllib.parse
+import zlib
+from collections import deque
+from collections.abc import Callable, Container, Iterable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from contextlib import closing
+from functools import partial
 from http import HTTPStatus
 from pathlib import Path
+from typing import Any, BinaryIO
+from uuid import uuid4
 
-import bs4
 import dulwich.index
 import dulwich.objects
 import dulwich.pack
-import requests
-import requests.adapters
-import socks
-from requests_pkcs12 import Pkcs12Adapter
+from celery import Task
 
+from core.config import settings
+from utils.checkout import checkout
+from utils.findings import write_findings_artifact
+from utils.http import TRANSFER_ERRORS, HttpSession, Response, create_session
+from utils.journal import CrawlJournal
 from utils.leaks import run_gitleaks
+from utils.listing import parse_listing
+from utils.metrics import DUMPS, FRONTIER_SIZE, PHASE_DURATION, REJECTED_RESPONSES, MetricsSession
+from utils.object_store import SharedObjectStore
+from utils.packing import pack_loose_objects
+from utils.probe import NotFoundFingerprint, fingerprint_not_found, probe_paths
+from utils.progress import ProgressReporter, ProgressSession
+from utils.ratelimit import HostLimiter, HostThrottled, ThrottledSession
+from utils.scan_cache import ScanCache
+from utils.scanner import scan_repository
+from utils.shaset import ShaSet, SpillQueue
 
 from .celery_worker import celery_app
 
+# files rewritten by git gc and commits, always revalidated on refresh
+MUTABLE_FILES = {".git/index", ".git/objects/info/packs", ".git/packed-refs", ".git/info/refs"}
+
+# phases redone on refresh, the objects phase keeps its seen-set
+REFRESH_PHASES = ("listing", "common", "refs", "packs", "find_objects", "finished")
+
+# size of the SHA1 trailer ending .pack and .idx files
+TRAILER_SIZE = 20
+
 
 def printf(fmt, *args, file=sys.stdout) -> None:  # noqa: ANN001, ANN002
     if args:
@@ -41,33 +67,28 @@ def is_safe_path(path):
     if path.startswith("/"):
         return False
 
-    safe_path = os.path.expanduser("~")
-    return os.path.commonpath((os.path.realpath(os.path.join(safe_path, path)), safe_path)) == safe_path
+    # resolved lexically, this runs for every entry of every listing
+    return os.path.normpath(path).split(os.sep, 1)[0] != ".."
 
 
 def get_indexed_files(response):
     """Return all the files in the directory index webpage"""
-    html = bs4.BeautifulSoup(response.text, "html.parser")
-    files = []
-
-    for link in html.find_all("a"):
-        url = urllib.parse.urlparse(link.get("href"))
-
-        if url.path and is_safe_path(url.path) and not url.scheme and not url.netloc:
-            files.append(url.path)
-
-    return files
+    _, entries = parse_listing(response.content, response.url, response.headers.get("Server", ""))
+    return [entry for entry in entries if is_safe_path(entry)]
 
 
 def verify_response(response):
     if response.status_code != 200:
+        REJECTED_RESPONSES.labels(reason="status").inc()
         return (
             False,
             f"[-] {response.url} responded with status code {response.status_code}\n",
         )
     elif "Content-Length" in response.headers and response.headers["Content-Length"] == 0:
+        REJECTED_RESPONSES.labels(reason="empty").inc()
         return False, f"[-] {response.url} responded with a zero-length body\n"
     elif "Content-Type" in response.headers and "text/html" in response.headers["Content-Type"]:
+        REJECTED_RESPONSES.labels(reason="html").inc()
         return False, f"[-] {response.url} responded with HTML\n"
     else:
         return True, ""
@@ -84,6 +105,75 @@ def create_intermediate_dirs(path):
             pass  # race condition
 
 
+def write_chunks(abspath: str, chunks: Iterable[bytes]) -> None:
+    """Write the chunks to a .part file and move it into place once complete.
+
+    A download interrupted half-way never leaves a truncated file at abspath,
+    so the "Already downloaded" checks only ever see complete files.
+    """
+    create_intermediate_dirs(abspath)
+    part_path = Path(abspath + ".part")
+    with part_path.open("wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    part_path.replace(abspath)
+
+
+def is_mutable(filepath: str) -> bool:
+    """Return True if the file can change between two dumps, unlike objects and packs."""
+    return not filepath.startswith(".git/objects/") or filepath == ".git/objects/info/packs"
+
+
+def is_known_missing(journal: CrawlJournal | None, filepath: str) -> bool:
+    """Return True if the previous dump found that filepath does not exist."""
+    if journal is None or filepath in MUTABLE_FILES:
+        return False
+    validator = journal.get_validator(filepath)
+    return validator is not None and validator[0] in (HTTPStatus.NOT_FOUND, HTTPStatus.GONE)
+
+
+def conditional_get(  # noqa: PLR0913
+    session: HttpSession,
+    filepath: str,
+    url: str,
+    directory: str,
+    timeout: float,
+    journal: CrawlJournal | None = None,
+    *,
+    refresh: bool = False,
+    stream: bool = False,
+) -> Response:
+    """GET url/filepath, revalidating the local copy with the validators of the previous dump.
+
+    In refresh mode the ETag and Last-Modified recorded by the journal are sent
+    back, so an unchanged file is answered with a bodyless 304 Not Modified.
+    """
+    headers = {}
+    validator = journal.get_validator(filepath) if journal is not None else None
+    if refresh and validator is not None and Path(directory, filepath).is_file():
+        _, etag, last_modified = validator
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = session.get(
+        f"{url}/{filepath}",
+        allow_redirects=False,
+        stream=stream,
+        timeout=timeout,
+        headers=headers or None,
+    )
+    if journal is not None and response.status_code != HTTPStatus.NOT_MODIFIED:
+        journal.set_validator(
+            filepath,
+            response.status_code,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+    return response
+
+
 def get_referenced_sha1(obj_file):
     """Return all the referenced SHA1 in the given object file"""
     objs = []
@@ -107,18 +197,232 @@ def get_referenced_sha1(obj_file):
     return objs
 
 
-def download_file(session, filepath, url, directory, timeout):
-    if os.path.isfile(os.path.join(directory, filepath)):
-        printf("[-] Already downloaded %s/%s\n", url, filepath)
-        return []
-
+def is_pack_file(filepath: str) -> bool:
+    """Return True for the .pack and .idx files, which both end with the SHA1 of their content."""
+    return filepath.startswith(".git/objects/pack/pack-") and filepath.endswith((".pack", ".idx"))
+
+
+def hash_part_file(part_path: str) -> tuple["hashlib._Hash", bytes]:
+    """Return the SHA1 of a partial download and its last 20 bytes, which may turn out to be the trailer."""
+    sha = hashlib.sha1(usedforsecurity=False)
+    tail = b""
+    with Path(part_path).open("rb") as f:
+        while chunk := f.read(settings.DOWNLOAD_CHUNK_SIZE):
+            data = tail + chunk
+            sha.update(data[:-TRAILER_SIZE])
+            tail = data[-TRAILER_SIZE:]
+    return sha, tail
+
+
+def write_hashed_chunks(
+    part_path: str,
+    mode: str,
+    chunks: Iterable[bytes],
+    sha: "hashlib._Hash",
+    tail: bytes,
+) -> bytes:
+    """Write chunks to a partial download, hashing them all but the last 20 bytes so far, and return those."""
+    with Path(part_path).open(mode) as f:
+        for chunk in chunks:
+            f.write(chunk)
+            data = tail + chunk
+            sha.update(data[:-TRAILER_SIZE])
+            tail = data[-TRAILER_SIZE:]
+    return tail
+
+
+def read_tail(path: str, size: int) -> bytes:
+    """Return the last size bytes of a file."""
+    with Path(path).open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - size))
+        return f.read()
+
+
+def pack_pair_matches(path: str) -> bool:
+    """Return False if path is a .pack or .idx whose counterpart is present and belongs to another pack.
+
+    Pack names are not checksums (dulwich, JGit and old git name them after
+    their objects), but the .idx repeats the trailer of its .pack just before
+    its own.
+    """
+    base = path[: path.rindex(".")]
+    pack_path, idx_path = base + ".pack", base + ".idx"
+    if not (Path(pack_path).is_file() and Path(idx_path).is_file()):
+        return True
+    return read_tail(idx_path, 2 * TRAILER_SIZE)[:TRAILER_SIZE] == read_tail(pack_path, TRAILER_SIZE)
+
+
+def fetch_trailer(session: HttpSession, filepath: str, url: str, timeout: float) -> bytes | None:
+    """Return the SHA1 trailer of a remote .pack or .idx from a Range request, None if ranges are not served."""
     with closing(
         session.get(
             f"{url}/{filepath}",
             allow_redirects=False,
             stream=True,
             timeout=timeout,
-        )
+            headers={"Range": f"bytes=-{TRAILER_SIZE}"},
+        ),
+    ) as response:
+        if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+            return None
+        trailer = response.content
+    return trailer if len(trailer) == TRAILER_SIZE else None
+
+
+def trailer_key(filepath: str, trailer: bytes) -> str:
+    """Return the object store key of a .pack or .idx, its verified trailer rather than its name."""
+    return trailer.hex() + Path(filepath).suffix
+
+
+def resume_headers(journal: CrawlJournal | None, filepath: str, offset: int) -> dict[str, str]:
+    """Return the headers requesting the bytes of filepath after offset."""
+    headers = {"Range": f"bytes={offset}-"}
+    # a file replaced on the server since the first attempt is sent whole instead of resumed
+    validator = journal.get_validator(filepath) if journal is not None else None
+    if validator is not None:
+        _, etag, last_modified = validator
+        if etag and not etag.startswith("W/"):
+            headers["If-Range"] = etag
+        elif last_modified:
+            headers["If-Range"] = last_modified
+    return headers
+
+
+def install_pack_file(url: str, filepath: str, part_path: str, sha: "hashlib._Hash", tail: bytes) -> bool:
+    """Move a downloaded .pack or .idx into place if its trailer and its counterpart match, drop it otherwise."""
+    if sha.digest() != tail:
+        REJECTED_RESPONSES.labels(reason="checksum").inc()
+        printf("[-] %s/%s failed its checksum verification\n", url, filepath, file=sys.stderr)
+        Path(part_path).unlink()
+        return False
+
+    abspath = part_path.removesuffix(".part")
+    Path(part_path).replace(abspath)
+    if not pack_pair_matches(abspath):
+        REJECTED_RESPONSES.labels(reason="pack_pair").inc()
+        printf("[-] %s/%s does not belong to the pack of the same name\n", url, filepath, file=sys.stderr)
+        Path(abspath).unlink()
+        return False
+    return True
+
+
+def download_pack_file(  # noqa: PLR0913
+    session: HttpSession,
+    filepath: str,
+    url: str,
+    directory: str,
+    timeout: float,
+    journal: CrawlJournal | None = None,
+) -> bool:
+    """Download a .pack or .idx file, resuming an interrupted download with a Range request.
+
+    Both formats end with the SHA1 of everything before it, which is computed
+    as the file is streamed. The .part file is only moved into place once the
+    trailer matches, and it is dropped if the .idx and .pack of that name do
+    not belong together. A connection dropped mid-transfer leaves the .part
+    file behind, and the next attempt only requests the missing bytes.
+    Return True if the file was downloaded and verified.
+    """
+    abspath = str(Path(directory, filepath).absolute())
+    part_path = abspath + ".part"
+    create_intermediate_dirs(abspath)
+
+    for attempt in range(settings.DOWNLOAD_RESUME_ATTEMPTS + 1):
+        offset = Path(part_path).stat().st_size if Path(part_path).is_file() else 0
+        headers = resume_headers(journal, filepath, offset) if offset else None
+
+        try:
+            with closing(
+                session.get(
+                    f"{url}/{filepath}",
+                    allow_redirects=False,
+                    stream=True,
+                    timeout=timeout,
+                    headers=headers,
+                ),
+            ) as response:
+                printf("[-] Fetching %s/%s [%d]\n", url, filepath, response.status_code)
+                chunks = response.iter_content(settings.DOWNLOAD_CHUNK_SIZE)
+                if response.status_code == HTTPStatus.PARTIAL_CONTENT:
+                    content_range = response.headers.get("Content-Range", "")
+                    if not content_range.startswith(f"bytes {offset}-"):
+                        printf(
+                            "[-] %s/%s answered an unexpected range %r\n",
+                            url,
+                            filepath,
+                            content_range,
+                            file=sys.stderr,
+                        )
+                        Path(part_path).unlink()
+                        continue
+                    printf("[-] Resuming %s/%s at byte %d\n", url, filepath, offset)
+                    sha, tail = hash_part_file(part_path)
+                    tail = write_hashed_chunks(part_path, "ab", chunks, sha, tail)
+                elif response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE and offset:
+                    # the previous attempt got every byte but died before the rename
+                    sha, tail = hash_part_file(part_path)
+                else:
+                    valid, error_message = verify_response(response)
+                    if journal is not None:
+                        journal.set_validator(
+                            filepath,
+                            response.status_code,
+                            response.headers.get("ETag"),
+                            response.headers.get("Last-Modified"),
+                        )
+                    if not valid:
+                        printf(error_message, file=sys.stderr)
+                        return False
+                    sha = hashlib.sha1(usedforsecurity=False)
+                    tail = write_hashed_chunks(part_path, "wb", chunks, sha, b"")
+        except TRANSFER_ERRORS as e:
+            if attempt == settings.DOWNLOAD_RESUME_ATTEMPTS:
+                raise
+            printf("[-] Transfer of %s/%s interrupted (%s), resuming\n", url, filepath, e, file=sys.stderr)
+            continue
+
+        return install_pack_file(url, filepath, part_path, sha, tail)
+
+    return False
+
+
+def download_file(  # noqa: PLR0911, PLR0913
+    session: HttpSession,
+    filepath: str,
+    url: str,
+    directory: str,
+    timeout: float,
+    object_store: SharedObjectStore | None = None,
+    journal: CrawlJournal | None = None,
+    *,
+    refresh: bool = False,
+) -> list[str]:
+    if refresh and is_known_missing(journal, filepath):
+        printf("[-] Skipping %s/%s, missing in the previous dump\n", url, filepath)
+        return []
+
+    # on refresh, files that can change are revalidated instead of skipped
+    if Path(directory, filepath).is_file() and not (refresh and filepath in MUTABLE_FILES):
+        printf("[-] Already downloaded %s/%s\n", url, filepath)
+        return []
+
+    # packs are shared through the object store, keyed by their trailer, which is checked on download
+    abspath = str(Path(directory, filepath).absolute())
+    if is_pack_file(filepath):
+        if object_store is not None:
+            trailer = fetch_trailer(session, filepath, url, timeout)
+            if trailer is not None and object_store.fetch(trailer_key(filepath, trailer), abspath):
+                if pack_pair_matches(abspath):
+                    printf("[-] Reused %s/%s from the object store\n", url, filepath)
+                    return []
+                Path(abspath).unlink()
+        if download_pack_file(session, filepath, url, directory, timeout, journal) and object_store is not None:
+            object_store.add(trailer_key(filepath, read_tail(abspath, TRAILER_SIZE)), abspath)
+        return []
+
+    with closing(
+        conditional_get(session, filepath, url, directory, timeout, journal, refresh=refresh, stream=True),
     ) as response:
         printf(
             "[-] Fetching %s/%s [%d]\n",
@@ -126,35 +430,38 @@ def download_file(session, filepath, url, directory, timeout):
             filepath,
             response.status_code,
         )
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            return []
 
         valid, error_message = verify_response(response)
         if not valid:
             printf(error_message, file=sys.stderr)
             return []
 
-        abspath = os.path.abspath(os.path.join(directory, filepath))
-        create_intermediate_dirs(abspath)
-
-        # write file
-        with open(abspath, "wb") as f:
-            for chunk in response.iter_content(4096):
-                f.write(chunk)
-
+        write_chunks(abspath, response.iter_content(settings.DOWNLOAD_CHUNK_SIZE))
     return []
 
 
-def download_directory(session, filepath, url, directory, timeout):
-    if os.path.isfile(os.path.join(directory, filepath)):
+def download_directory(  # noqa: PLR0911, PLR0913
+    session: HttpSession,
+    filepath: str,
+    url: str,
+    directory: str,
+    timeout: float,
+    journal: CrawlJournal | None = None,
+    *,
+    refresh: bool = False,
+) -> list[str]:
+    if Path(directory, filepath).is_file() and not (refresh and is_mutable(filepath)):
         printf("[-] Already downloaded %s/%s\n", url, filepath)
         return []
 
+    if is_pack_file(filepath):
+        download_pack_file(session, filepath, url, directory, timeout, journal)
+        return []
+
     with closing(
-        session.get(
-            f"{url}/{filepath}",
-            allow_redirects=False,
-            stream=True,
-            timeout=timeout,
-        )
+        conditional_get(session, filepath, url, directory, timeout, journal, refresh=refresh, stream=True),
     ) as response:
         printf(
             "[-] Fetching %s/%s [%d]\n",
@@ -162,6 +469,8 @@ def download_directory(session, filepath, url, directory, timeout):
             filepath,
             response.status_code,
         )
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            return []
 
         if (
             response.status_code in (301, 302)
@@ -181,36 +490,50 @@ def download_directory(session, filepath, url, directory, timeout):
                 return []
 
             abspath = os.path.abspath(os.path.join(directory, filepath))
-            create_intermediate_dirs(abspath)
-
-            # write file
-            with open(abspath, "wb") as f:
-                for chunk in response.iter_content(4096):
-                    f.write(chunk)
+            write_chunks(abspath, response.iter_content(settings.DOWNLOAD_CHUNK_SIZE))
 
     return []
 
 
-def find_refs(session, filepath, url, directory, timeout):
-    response = session.get(f"{url}/{filepath}", allow_redirects=False, timeout=timeout)
-    printf("[-] Fetching %s/%s [%d]\n", url, filepath, response.status_code)
-
-    valid, error_message = verify_response(response)
-    if not valid:
-        printf(error_message, file=sys.stderr)
+def find_refs(  # noqa: PLR0913
+    session: HttpSession,
+    filepath: str,
+    url: str,
+    directory: str,
+    timeout: float,
+    journal: CrawlJournal | None = None,
+    *,
+    refresh: bool = False,
+    not_found: NotFoundFingerprint | None = None,
+) -> list[str]:
+    if refresh and is_known_missing(journal, filepath):
+        printf("[-] Skipping %s/%s, missing in the previous dump\n", url, filepath)
         return []
 
     abspath = os.path.abspath(os.path.join(directory, filepath))
-    create_intermediate_dirs(abspath)
+    response = conditional_get(session, filepath, url, directory, timeout, journal, refresh=refresh)
+    printf("[-] Fetching %s/%s [%d]\n", url, filepath, response.status_code)
 
-    # write file
-    with open(abspath, "w") as f:
-        f.write(response.text)
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        # unchanged since the previous dump, the refs are read from the local copy
+        content = Path(abspath).read_text()
+    else:
+        valid, error_message = verify_response(response)
+        if not valid:
+            printf(error_message, file=sys.stderr)
+            return []
+        if not_found is not None and not_found.soft and not_found.is_miss(response, filepath):
+            REJECTED_RESPONSES.labels(reason="soft_404").inc()
+            printf("[-] %s/%s is the soft 404 page\n", url, filepath, file=sys.stderr)
+            return []
+
+        content = response.text
+        write_chunks(abspath, [content.encode()])
 
     # find refs
     tasks = []
 
-    for ref in re.findall(r"(refs(/[a-zA-Z0-9\-\.\_\*]+)+)", response.text):
+    for ref in re.findall(r"(refs(/[a-zA-Z0-9\-\.\_\*]+)+)", content):
         ref = ref[0]
         if not ref.endswith("*") and is_safe_path(ref):
             tasks.append(f".git/{ref}")
@@ -219,17 +542,82 @@ def find_refs(session, filepath, url, directory, timeout):
     return tasks
 
 
-def find_objects(session, obj, url, directory, timeout):
+def parse_loose_object(obj: str, chunks: Iterable[bytes]) -> tuple[bytes, dulwich.objects.ShaFile]:
+    """Inflate and verify a loose object as it is downloaded.
+
+    Return the compressed bytes together with the parsed object. Blob contents
+    are only hashed, never buffered, since blobs reference no other objects.
+    Raise ValueError if the payload is not the zlib stream of object `obj`.
+    """
+    decompressor = zlib.decompressobj()
+    sha = hashlib.sha1(usedforsecurity=False)
+    raw = bytearray()
+    header = None
+    body = bytearray()
+
+    for chunk in chunks:
+        raw += chunk
+        try:
+            data = decompressor.decompress(chunk)
+        except zlib.error as e:
+            msg = f"invalid zlib stream: {e}"
+            raise ValueError(msg) from e
+        sha.update(data)
+
+        if header is None:
+            body += data
+            if b"\0" in body:
+                header, _, rest = bytes(body).partition(b"\0")
+                type_name = header.split(b" ", 1)[0]
+                if type_name not in (b"commit", b"tree", b"blob", b"tag"):
+                    msg = f"unexpected object type {type_name!r}"
+                    raise ValueError(msg)
+                body = bytearray(rest) if type_name in (b"commit", b"tree") else None
+        elif body is not None:
+            body += data
+
+    if header is None or not decompressor.eof:
+        msg = "truncated object"
+        raise ValueError(msg)
+    if sha.hexdigest() != obj:
+        msg = "SHA-1 mismatch"
+        raise ValueError(msg)
+
+    type_name = header.split(b" ", 1)[0]
+    obj_file = dulwich.objects.object_class(type_name)()
+    if body is not None:
+        obj_file.set_raw_string(bytes(body))
+    return bytes(raw), obj_file
+
+
+def find_objects(  # noqa: PLR0913
+    session: HttpSession,
+    obj: str,
+    url: str,
+    directory: str,
+    timeout: float,
+    object_store: SharedObjectStore | None = None,
+) -> list[str]:
     filepath = f".git/objects/{obj[:2]}/{obj[2:]}"
+    abspath = str(Path(directory, filepath).resolve())
 
-    if os.path.isfile(os.path.join(directory, filepath)):
+    if Path(abspath).is_file():
         printf("[-] Already downloaded %s/%s\n", url, filepath)
-    else:
-        response = session.get(
+    elif object_store is not None and object_store.fetch(obj, abspath):
+        printf("[-] Reused %s/%s from the object store\n", url, filepath)
+    if Path(abspath).is_file():
+        # parse object file to find other objects
+        obj_file = dulwich.objects.ShaFile.from_path(abspath)
+        return get_referenced_sha1(obj_file)
+
+    with closing(
+        session.get(
             f"{url}/{filepath}",
             allow_redirects=False,
+            stream=True,
             timeout=timeout,
         )
+    ) as response:
         printf(
             "[-] Fetching %s/%s [%d]\n",
             url,
@@ -242,65 +630,402 @@ def find_objects(session, obj, url, directory, timeout):
             printf(error_message, file=sys.stderr)
             return []
 
-        abspath = os.path.abspath(os.path.join(directory, filepath))
-        create_intermediate_dirs(abspath)
-
-        # write file
-        with open(abspath, "wb") as f:
-            f.write(response.content)
+        # parse while downloading, only verified objects reach the disk
+        try:
+            raw, obj_file = parse_loose_object(obj, response.iter_content(65536))
+        except ValueError as e:
+            REJECTED_RESPONSES.labels(reason="invalid_object").inc()
+            printf("[-] %s/%s is not a valid object: %s\n", url, filepath, e, file=sys.stderr)
+            return []
 
-    abspath = os.path.abspath(os.path.join(directory, filepath))
-    # parse object file to find other objects
-    obj_file = dulwich.objects.ShaFile.from_path(abspath)
+    write_chunks(abspath, [raw])
+    if object_store is not None:
+        object_store.add(obj, abspath)
     return get_referenced_sha1(obj_file)
 
 
-def process_tasks(initial_tasks, process_task_func, session, url, directory, timeout):
-    tasks_seen = set()
-    pending_tasks = initial_tasks
+def probe_candidates(  # noqa: PLR0913
+    session: HttpSession,
+    tasks: list[str],
+    url: str,
+    timeout: float,
+    jobs: int,
+    not_found: NotFoundFingerprint | None,
+    journal: CrawlJournal,
+    phase: str,
+) -> list[str]:
+    """Keep the candidates of a phase that exist, when the server answers missing paths with a soft 404."""
+    if not_found is None or not not_found.soft or journal.is_phase_done(phase):
+        return tasks
+    with PHASE_DURATION.labels(phase="probe").time():
+        found = probe_paths(session, tasks, url, timeout, not_found, jobs)
+    printf("[-] Found %d of the %d %s candidates\n", len(found), len(tasks), phase)
+    return found
+
+
+def process_tasks(  # noqa: C901, PLR0912, PLR0913
+    initial_tasks: Iterable[str],
+    process_task_func: Callable[..., list[str]],
+    session: HttpSession,
+    url: str,
+    directory: str,
+    timeout: int,
+    jobs: int = 1,
+    journal: CrawlJournal | None = None,
+    phase: str | None = None,
+    skip: Container[str] = (),
+    progress: ProgressReporter | None = None,
+    seen: set[str] | ShaSet | None = None,
+    max_in_memory: int | None = None,
+) -> None:
+    """Run process_task_func over the tasks with up to `jobs` concurrent workers.
+
+    Workers share one frontier and one seen-set; the tasks returned by a worker
+    are queued as soon as it finishes, so new work is picked up without waiting
+    for the rest of the pool.
+
+    With a journal, the frontier and the seen-set of `phase` are persisted as
+    the crawl goes, and a phase that was completed by a previous run is skipped.
+    Tasks in `skip` are treated as already seen.
+
+    With a ProgressReporter, the phase and its discovered and processed tasks
+    are reported as the crawl goes.
+
+    `seen` replaces the default seen-set, e.g. with a ShaSet for SHA1 tasks,
+    and with `max_in_memory` the frontier spills to disk past that many tasks.
+    """
+    tasks_seen = set() if seen is None else seen
+    if journal is not None:
+        if journal.is_phase_done(phase):
+            printf("[-] Skipping %s, already completed\n", phase)
+            return
+        journal.add_tasks(phase, initial_tasks)
+        tasks_seen, initial_tasks = journal.load(phase, tasks_seen)
+
+    if max_in_memory:
+        pending_tasks = SpillQueue((), max_in_memory, str(Path(directory).absolute().parent))
+    else:
+        pending_tasks = deque()
+    # counted while queued, a spilled frontier cannot be iterated
+    discovered = 0
+    for task in initial_tasks:
+        pending_tasks.append(task)
+        if task not in tasks_seen and task not in skip:
+            discovered += 1
+    running = {}
+    jobs = max(1, jobs)
+    if progress is not None:
+        progress.set_phase(phase, discovered)
+    frontier_size = FRONTIER_SIZE.labels(phase=phase)
+
+    with PHASE_DURATION.labels(phase=phase).time(), ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending_tasks or running:
+            while pending_tasks and len(running) < jobs:
+                task = pending_tasks.popleft()
+                if task not in tasks_seen and task not in skip:
+                    tasks_seen.add(task)
+                    future = executor.submit(process_task_func, session, task, url, directory, timeout)
+                    running[future] = task
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                new_tasks = future.result()
+                pending_tasks.extend(new_tasks)
+                if journal is not None:
+                    journal.complete_task(phase, task, new_tasks)
+                if progress is not None:
+                    progress.task_done([task for task in new_tasks if task not in tasks_seen and task not in skip])
+            frontier_size.set(len(pending_tasks))
+        frontier_size.set(0)
+
+    if max_in_memory:
+        pending_tasks.close()
+
+    if journal is not None:
+        journal.mark_phase_done(phase)
+
+
+def find_packs(directory: str) -> list[tuple[str, str]]:
+    """Return the (.pack, .idx) paths of the downloaded packs."""
+    pack_file_dir = Path(directory, ".git", "objects", "pack")
+    return [
+        (str(pack_data_path), str(pack_data_path.with_suffix(".idx")))
+        for pack_data_path in pack_file_dir.glob("pack-*.pack")
+        if pack_data_path.with_suffix(".idx").is_file()
+    ]
+
+
+def find_packed_objects(directory: str) -> ShaSet:
+    """Return the SHA1 of every object stored in the downloaded packs, read from the .idx files only."""
+    packed_objs = ShaSet()
+    for _, pack_idx_path in find_packs(directory):
+        pack_idx = dulwich.pack.load_pack_index(pack_idx_path)
+        for sha, _, _ in pack_idx.iterentries():
+            packed_objs.add(sha)
+        pack_idx.close()
+    return packed_objs
+
+
+def read_pack_entry_header(f: BinaryIO, offset: int) -> tuple[int, int | bytes | None]:
+    """Return the type of the pack entry at offset and, for deltas, its base offset or SHA1."""
+    f.seek(offset)
+    # type and size varint, then at most an offset varint or a 20 bytes SHA1
+    data = f.read(64)
+    c = data[0]
+    type_num = (c >> 4) & 7
+    i = 1
+    while c & 0x80:
+        c = data[i]
+        i += 1
+
+    if type_num == dulwich.pack.OFS_DELTA:
+        c = data[i]
+        i += 1
+        delta = c & 0x7F
+        while c & 0x80:
+            c = data[i]
+            i += 1
+            delta = ((delta + 1) << 7) | (c & 0x7F)
+        return type_num, offset - delta
+    if type_num == dulwich.pack.REF_DELTA:
+        return type_num, data[i : i + 20]
+    return type_num, None
+
+
+def find_pack_references(pack_data_path: str, pack_idx_path: str) -> ShaSet:
+    """Return the objects referenced by the commits and trees of a pack.
+
+    Object types are resolved from the entry headers, following delta chains
+    through the .idx, so blobs are never inflated.
+    """
+    objs = ShaSet()
+    pack_idx = dulwich.pack.load_pack_index(pack_idx_path)
+    pack = dulwich.pack.Pack.from_objects(dulwich.pack.PackData(pack_data_path), pack_idx)
+    types = {}
+
+    with Path(pack_data_path).open("rb") as f:
+
+        def resolve_type(offset: int) -> int | None:
+            chain = []
+            while offset not in types:
+                chain.append(offset)
+                type_num, base = read_pack_entry_header(f, offset)
+                if type_num == dulwich.pack.OFS_DELTA:
+                    offset = base
+                elif type_num == dulwich.pack.REF_DELTA:
+                    try:
+                        offset = pack_idx.object_offset(base)
+                    except KeyError:
+                        # thin pack, the base is not in this pack
+                        types[offset] = None
+                else:
+                    types[offset] = type_num
+            for entry_offset in chain:
+                types[entry_offset] = types[offset]
+            return types[offset]
+
+        entries = sorted(pack_idx.iterentries(), key=lambda entry: entry[1])
+        for sha, offset, _ in entries:
+            type_num = resolve_type(offset)
+            if type_num not in (dulwich.objects.Commit.type_num, dulwich.objects.Tree.type_num):
+                continue
+            obj_file = dulwich.objects.ShaFile.from_raw_string(*pack.get_raw(sha))
+            objs.update(get_referenced_sha1(obj_file))
+
+    pack.close()
+    return objs
+
+
+def find_objects_to_fetch(directory: str, walked_packs: Container[str] = ()) -> ShaSet:
+    """Return the objects referenced by the refs, logs, index and packs of the dump.
+
+    Packs named in walked_packs were walked by a previous run and are skipped.
+    """
+    objs = ShaSet()
+
+    # .git/packed-refs, .git/info/refs, .git/refs/*, .git/logs/*
+    git_dir = Path(directory, ".git")
+    files = [git_dir / "packed-refs", git_dir / "info" / "refs", git_dir / "FETCH_HEAD", git_dir / "ORIG_HEAD"]
+    files.extend(filepath for filepath in (git_dir / "refs").rglob("*") if filepath.is_file())
+    files.extend(filepath for filepath in (git_dir / "logs").rglob("*") if filepath.is_file())
+
+    for filepath in files:
+        if not filepath.exists():
+            continue
 
-    while pending_tasks:
-        task = pending_tasks.pop(0)
-        if task not in tasks_seen:
-            tasks_seen.add(task)
-            new_tasks = process_task_func(session, task, url, directory, timeout)
-            pending_tasks.extend(new_tasks)
+        content = filepath.read_text()
+        for match in re.findall(r"(^|\s)([a-f0-9]{40})($|\s)", content):
+            objs.add(match[1])
 
+    # use .git/index to find objects
+    index_path = git_dir / "index"
+    if index_path.exists():
+        index = dulwich.index.Index(str(index_path))
 
-def sanitize_file(filepath):
-    """Inplace comment out possibly unsafe lines based on regex"""
-    assert os.path.isfile(filepath), f"{filepath} is not a file"
+        for entry in index.iterobjects():
+            objs.add(entry[1].decode())
 
-    UNSAFE = r"^\s*fsmonitor|sshcommand|askpass|editor|pager"
+    # use packs to find more objects to fetch
+    for pack_data_path, pack_idx_path in find_packs(directory):
+        if Path(pack_data_path).name in walked_packs:
+            continue
+        objs |= find_pack_references(pack_data_path, pack_idx_path)
 
-    with open(filepath, "r+") as f:
+    # objects already in a pack are never requested as loose objects
+    return objs - find_packed_objects(directory)
+
+
+def sanitize_file(filepath: Path) -> None:
+    """Inplace comment out possibly unsafe lines based on regex."""
+    assert filepath.is_file(), f"{filepath} is not a file"
+
+    unsafe = r"^\s*fsmonitor|sshcommand|askpass|editor|pager"
+
+    with filepath.open("r+") as f:
         content = f.read()
-        modified_content = re.sub(UNSAFE, "# \g<0>", content, flags=re.IGNORECASE)
+        modified_content = re.sub(unsafe, r"# \g<0>", content, flags=re.IGNORECASE)
         if content != modified_content:
             printf(f"Warning: '{filepath}' file was altered\n")
             f.seek(0)
             f.write(modified_content)
 
 
+def checkout_and_scan(  # noqa: PLR0913
+    directory: str,
+    url: str,
+    jobs: int,
+    scanner: str,
+    artifact_name: str,
+    progress: ProgressReporter | None = None,
+) -> dict[str, Any]:
+    """Check out the working tree of a dump, scan it for secrets and return the success result.
+
+    The findings are written to an artifact and only their summary is part of
+    the result.
+    """
+    printf("[-] Checking out working tree\n")
+    if progress is not None:
+        progress.set_phase("checkout")
+    with PHASE_DURATION.labels(phase="checkout").time():
+        written, missing = checkout(directory, jobs)
+    printf("[-] Checked out %d files, %d missing\n", written, len(missing))
+    for path in missing:
+        printf("[-] Missing object for %s\n", path, file=sys.stderr)
+
+    result = {"status": "success", "path": directory, "url": str(url), "missing_objects": len(missing)}
+    if progress is not None:
+        progress.set_phase("scan")
+    # both scanners skip the blobs they already scanned in any dump
+    scan_cache = ScanCache(settings.SCAN_CACHE_PATH, settings.SCAN_CACHE_MAX_ENTRIES)
+    try:
+        if scanner == "native":
+            printf("[-] Scanning objects for secrets\n")
+            with PHASE_DURATION.labels(phase="native_scan").time():
+                leaks = scan_repository(directory, jobs, scan_cache)
+        else:
+            with PHASE_DURATION.labels(phase="gitleaks").time():
+                leaks = run_gitleaks(directory, scan_cache=scan_cache)
+        result["scan_cache"] = scan_cache.stats()
+    finally:
+        scan_cache.close()
+    printf("[-] Found %d leaks\n", len(leaks))
+    result["findings"] = write_findings_artifact(leaks, artifact_name)
+    return result
+
+
 @celery_app.task(bind=True, name="utils.git_dump.fetch_git")
-def fetch_git(self, url: str, directory, jobs, retry, timeout, http_headers, client_cert_p12=None, client_cert_p12_password=None):
-    """Dump a git repository into the output directory"""
+def fetch_git(  # noqa: C901, PLR0912, PLR0913, PLR0915
+    self: Task,
+    url: str,
+    directory: str,
+    jobs: int,
+    retry: int,
+    timeout: int,
+    http_headers: dict[str, str] | None,
+    client_cert_p12: str | None = None,
+    client_cert_p12_password: str | None = None,
+    *,
+    http_backend: str = "requests",
+    http2: bool = False,
+    max_connections: int | None = None,
+    pack_objects: bool = False,
+    scanner: str = "gitleaks",
+    refresh: bool = False,
+) -> dict[str, Any]:
+    """Dump a git repository into the output directory.
+
+    With refresh, a previous dump of the same URL is updated in place: mutable
+    files are revalidated with conditional requests, files missing last time
+    are not requested again, and only objects that were not known are fetched.
+    """
+    session = None
+    limiter = None
+    journal = None
+    object_store = None
+    progress = None
+    status = "error"
     try:
         save_path = Path(directory.replace(":", "_"))
         url = str(url)
         os.makedirs(save_path, exist_ok=True)
 
-        session = requests.Session()
-        session.verify = False
-        session.headers = http_headers
-        if client_cert_p12:
-            session.mount(url, Pkcs12Adapter(pkcs12_filename=client_cert_p12, pkcs12_password=client_cert_p12_password))
-        else:
-            session.mount(url, requests.adapters.HTTPAdapter(max_retries=retry))
+        session = create_session(
+            url,
+            backend=http_backend,
+            jobs=jobs,
+            retry=retry,
+            http_headers=http_headers,
+            client_cert_p12=client_cert_p12,
+            client_cert_p12_password=client_cert_p12_password,
+            http2=http2,
+            max_connections=max_connections,
+        )
+        session = MetricsSession(session)
+
+        # hosts are throttled cluster-wide through the Redis of the broker
+        rate_limit_url = settings.RATE_LIMIT_REDIS or settings.CELERY_BROKER
+        if settings.RATE_LIMIT_ENABLED and rate_limit_url.startswith(("redis://", "rediss://", "unix://")):
+            limiter = HostLimiter(
+                rate_limit_url,
+                rate=settings.RATE_LIMIT_RATE,
+                burst=settings.RATE_LIMIT_BURST,
+                max_in_flight=settings.RATE_LIMIT_MAX_IN_FLIGHT,
+                max_wait=settings.RATE_LIMIT_MAX_WAIT,
+                max_backoff=settings.RATE_LIMIT_MAX_BACKOFF,
+                lease_ttl=settings.RATE_LIMIT_LEASE_TTL,
+            )
+            session = ThrottledSession(session, limiter, retries=retry)
+
+        # structured progress for the API, published on the same Redis
+        progress_url = settings.PROGRESS_REDIS or settings.CELERY_BROKER
+        if self.request.id and progress_url.startswith(("redis://", "rediss://", "unix://")):
+            progress = ProgressReporter(self.request.id, progress_url, settings.PROGRESS_INTERVAL)
+            session = ProgressSession(session, progress)
 
         if os.listdir(save_path):
             printf("Warning: Destination '%s' is not empty\n", directory)
 
+        if settings.OBJECT_STORE_PATH:
+            object_store = SharedObjectStore(settings.OBJECT_STORE_PATH, settings.OBJECT_STORE_QUOTA)
+
+        # the journal lives next to the dump, not inside the scanned working tree
+        journal = CrawlJournal(directory.rstrip("/") + ".journal")
+        if not (Path(directory).is_dir() and any(Path(directory).iterdir())):
+            # the files of the previous run are gone, start a fresh dump
+            journal.reset()
+        elif journal.is_phase_done("finished"):
+            if refresh:
+                printf("[-] Refreshing the previous dump\n")
+                for phase in REFRESH_PHASES:
+                    journal.restart_phase(phase)
+                journal.restart_phase("objects", keep_seen=True)
+            else:
+                journal.reset()
+
         if url.endswith("HEAD"):
             url = url[:-4]
         url = url.rstrip("/")
@@ -328,15 +1053,6 @@ def fetch_git(self, url: str, directory, jobs, retry, timeout, http_headers, cli
             )
             return {"status": "error", "path": f"error: {url}/.git/HEAD is not a git HEAD file", "url": str(url)}
 
-        # set up environment to ensure proxy usage
-        environment = os.environ.copy()
-        configured_proxy = socks.getdefaultproxy()
-        if configured_proxy is not None:
-            proxy_types = ["http", "socks4h", "socks5h"]
-            environment["ALL_PROXY"] = (
-                f"http.proxy={proxy_types[configured_proxy[0]]}://{configured_proxy[1]}:{configured_proxy[2]}"
-            )
-
         # check for directory listing
         printf("[-] Testing %s/.git/ ", url)
         response = session.get(f"{url}/.git/", allow_redirects=False)
@@ -346,23 +1062,37 @@ def fetch_git(self, url: str, directory, jobs, retry, timeout, http_headers, cli
             printf("[-] Fetching .git recursively\n")
             process_tasks(
                 [".git/", ".gitignore"],
-                download_directory,
+                partial(download_directory, journal=journal, refresh=refresh),
                 session,
                 url,
                 directory,
                 timeout,
+                jobs,
+                journal,
+                "listing",
+                progress=progress,
             )
 
-            os.chdir(directory)
+            if pack_objects:
+                printf("[-] Packing loose objects\n")
+                with PHASE_DURATION.labels(phase="pack").time():
+                    pack_loose_objects(directory)
 
             printf("[-] Sanitizing .git/config\n")
-            sanitize_file(".git/config")
+            sanitize_file(Path(directory, ".git", "config"))
+            result = checkout_and_scan(directory, url, jobs, scanner, self.request.id or str(uuid4()), progress)
+            journal.mark_phase_done("finished")
+            status = "success"
+            return result
+
+        # no directory listing, learn how the server answers missing paths
+        not_found = None
+        if not (journal.is_phase_done("common") and journal.is_phase_done("refs")):
+            with PHASE_DURATION.labels(phase="probe").time():
+                not_found = fingerprint_not_found(session, url, timeout)
+            if not_found.soft:
+                printf("[-] Missing paths are answered with a soft 404, probing the candidates first\n")
 
-            printf("[-] Running git checkout .\n")
-            subprocess.check_call(["git", "checkout", "."], env=environment)
-            return {"status": "success", "path": directory, "url": str(url)}
-
-        # no directory listing
         printf("[-] Fetching common files\n")
         tasks = [
             ".gitignore",
@@ -384,13 +1114,18 @@ def fetch_git(self, url: str, directory, jobs, retry, timeout, http_headers, cli
             ".git/info/exclude",
             ".git/objects/info/packs",
         ]
+        tasks = probe_candidates(session, tasks, url, timeout, jobs, not_found, journal, "common")
         process_tasks(
             tasks,
-            download_file,
+            partial(download_file, journal=journal, refresh=refresh),
             session,
             url,
             directory,
             timeout,
+            jobs,
+            journal,
+            "common",
+            progress=progress,
         )
 
         # find refs
@@ -438,13 +1173,18 @@ def fetch_git(self, url: str, directory, jobs, retry, timeout, http_headers, cli
             ".git/refs/wip/index/refs/heads/production",
             ".git/refs/wip/index/refs/heads/development",
         ]
+        tasks = probe_candidates(session, tasks, url, timeout, jobs, not_found, journal, "refs")
         process_tasks(
             tasks,
-            find_refs,
+            partial(find_refs, journal=journal, refresh=refresh, not_found=not_found),
             session,
             url,
             directory,
             timeout,
+            jobs,
+            journal,
+            "refs",
+            progress=progress,
         )
 
         # find packs
@@ -463,87 +1203,80 @@ def fetch_git(self, url: str, directory, jobs, retry, timeout, http_headers, cli
 
         process_tasks(
             tasks,
-            download_file,
+            partial(download_file, object_store=object_store, journal=journal, refresh=refresh),
             session,
             url,
             directory,
             timeout,
+            jobs,
+            journal,
+            "packs",
+            progress=progress,
         )
 
         # find objects
-        printf("[-] Finding objects\n")
-        objs = set()
-        packed_objs = set()
-
-        # .git/packed-refs, .git/info/refs, .git/refs/*, .git/logs/*
-        files = [
-            os.path.join(directory, ".git", "packed-refs"),
-            os.path.join(directory, ".git", "info", "refs"),
-            os.path.join(directory, ".git", "FETCH_HEAD"),
-            os.path.join(directory, ".git", "ORIG_HEAD"),
-        ]
-        for dirpath, _, filenames in os.walk(os.path.join(directory, ".git", "refs")):
-            for filename in filenames:
-                files.append(os.path.join(dirpath, filename))
-        for dirpath, _, filenames in os.walk(os.path.join(directory, ".git", "logs")):
-            for filename in filenames:
-                files.append(os.path.join(dirpath, filename))
-
-        for filepath in files:
-            if not os.path.exists(filepath):
-                continue
-
-            with open(filepath, "r") as f:
-                content = f.read()
-
-            for obj in re.findall(r"(^|\s)([a-f0-9]{40})($|\s)", content):
-                obj = obj[1]
-                objs.add(obj)
-
-        # use .git/index to find objects
-        index_path = os.path.join(directory, ".git", "index")
-        if os.path.exists(index_path):
-            index = dulwich.index.Index(index_path)
-
-            for entry in index.iterobjects():
-                objs.add(entry[1].decode())
-
-        # use packs to find more objects to fetch, and objects that are packed
-        pack_file_dir = os.path.join(directory, ".git", "objects", "pack")
-        if os.path.isdir(pack_file_dir):
-            for filename in os.listdir(pack_file_dir):
-                if filename.startswith("pack-") and filename.endswith(".pack"):
-                    pack_data_path = os.path.join(pack_file_dir, filename)
-                    pack_idx_path = os.path.join(pack_file_dir, filename[:-5] + ".idx")
-                    pack_data = dulwich.pack.PackData(pack_data_path)
-                    pack_idx = dulwich.pack.load_pack_index(pack_idx_path)
-                    pack = dulwich.pack.Pack.from_objects(pack_data, pack_idx)
-
-                    for obj_file in pack.iterobjects():
-                        packed_objs.add(obj_file.sha().hexdigest())
-                        objs |= set(get_referenced_sha1(obj_file))
+        if journal.is_phase_done("find_objects"):
+            printf("[-] Skipping find_objects, already completed\n")
+        else:
+            printf("[-] Finding objects\n")
+            # packs walked by a previous dump hold no new references
+            walked_packs, _ = journal.load("pack_walk")
+            with PHASE_DURATION.labels(phase="find_objects").time():
+                journal.add_tasks("objects", find_objects_to_fetch(directory, walked_packs))
+            for pack_data_path, _ in find_packs(directory):
+                journal.complete_task("pack_walk", Path(pack_data_path).name, [])
+            journal.mark_phase_done("find_objects")
 
         # fetch all objects
         printf("[-] Fetching objects\n")
         process_tasks(
-            list(objs),
-            find_objects,
+            [],
+            partial(find_objects, object_store=object_store),
             session,
             url,
             directory,
             timeout,
+            jobs,
+            journal,
+            "objects",
+            find_packed_objects(directory),
+            progress=progress,
+            seen=ShaSet(),
+            max_in_memory=settings.FRONTIER_MAX_IN_MEMORY,
         )
 
-        # git checkout
-        printf("[-] Running git checkout .\n")
-        os.chdir(directory)
-        sanitize_file(".git/config")
-
-        # ignore errors
-        subprocess.call(["git", "checkout", "."], stderr=open(os.devnull, "wb"), env=environment)
-        leaks = run_gitleaks(directory)
-        print(leaks)
-        return {"status": "success", "path": directory, "url": str(url), "leaks": leaks}
+        if pack_objects:
+            printf("[-] Packing loose objects\n")
+            with PHASE_DURATION.labels(phase="pack").time():
+                pack_loose_objects(directory)
+
+        # checkout, skipping missing objects
+        sanitize_file(Path(directory, ".git", "config"))
+        result = checkout_and_scan(directory, url, jobs, scanner, self.request.id or str(uuid4()), progress)
+        if object_store is not None:
+            result["object_store"] = object_store.stats()
+        journal.mark_phase_done("finished")
+        status = "success"
+    except HostThrottled as e:
+        # free the worker for other hosts, the journal resumes the dump on retry
+        printf("[-] %s, rescheduling\n", e)
+        status = "retry"
+        raise self.retry(exc=e, countdown=e.retry_after, max_retries=settings.RATE_LIMIT_MAX_RETRIES) from e
     except Exception as e:
         print(e)
         return {"status": "error", "path": str(e), "url": ""}
+    else:
+        return result
+    finally:
+        DUMPS.labels(status=status).inc()
+        if progress is not None:
+            progress.finish(status)
+            progress.close()
+        if session is not None:
+            session.close()
+        if limiter is not None:
+            limiter.close()
+        if journal is not None:
+            journal.close()
+        if object_store is not None:
+            object_store.close()
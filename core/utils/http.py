@@ -0,0 +1,181 @@
+import ssl
+from collections.abc import Iterator
+from typing import Protocol
+
+import httpx
+import requests
+import requests.adapters
+import socks
+from requests_pkcs12 import Pkcs12Adapter
+
+HTTP_BACKENDS = ("requests", "httpx")
+# PySocks proxy types supported by httpx, which has no SOCKS4 client
+PROXY_SCHEMES = {socks.PROXY_TYPE_HTTP: "http", socks.PROXY_TYPE_SOCKS5: "socks5"}
+# raised by both backends when a connection drops, including in the middle of a body
+TRANSFER_ERRORS = (requests.RequestException, httpx.HTTPError)
+
+
+def get_proxy_url() -> str | None:
+    """Return the proxy configured with socks.set_default_proxy as an URL, if any."""
+    configured_proxy = socks.getdefaultproxy()
+    if configured_proxy is None:
+        return None
+
+    proxy_type, host, port = configured_proxy[:3]
+    if proxy_type not in PROXY_SCHEMES:
+        msg = "SOCKS4 proxies are not supported by the httpx backend, use SOCKS5 or the requests backend"
+        raise ValueError(msg)
+    return f"{PROXY_SCHEMES[proxy_type]}://{host}:{port}"
+
+
+class HttpxResponse:
+    """Expose an httpx response with the subset of the requests.Response API used by the dumper."""
+
+    def __init__(self, response: httpx.Response) -> None:
+        """Wrap a response sent with stream=True, whose body is read on demand."""
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self) -> bytes:
+        return self._response.read()
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        return self._response.iter_bytes(chunk_size)
+
+    def close(self) -> None:
+        self._response.close()
+
+
+# a response of either backend
+Response = requests.Response | HttpxResponse
+
+
+class HttpSession(Protocol):
+    """The part of the requests.Session API used by the dumper, shared by both backends and their wrappers."""
+
+    def get(self, url: str, **kwargs: object) -> Response: ...
+
+    def head(self, url: str, **kwargs: object) -> Response: ...
+
+
+class HttpxSession:
+    """requests.Session look-alike backed by an httpx.Client.
+
+    The client is shared by every dumper worker, so the sockets stay in one
+    bounded keep-alive pool, and with http2 the requests of all the workers
+    are multiplexed over a few connections to the host.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        headers: dict[str, str] | None = None,
+        retries: int = 0,
+        max_connections: int = 100,
+        *,
+        http2: bool = False,
+        ssl_context: ssl.SSLContext | None = None,
+    ) -> None:
+        """Open the client, verifying no certificates like the requests backend."""
+        if ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        # same as requests.Session.verify = False
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+
+        transport = httpx.HTTPTransport(
+            verify=ssl_context,
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            proxy=get_proxy_url(),
+            retries=retries,
+        )
+        self.client = httpx.Client(headers=headers, transport=transport)
+
+    def request(  # noqa: PLR0913
+        self,
+        method: str,
+        url: str,
+        *,
+        allow_redirects: bool = True,
+        stream: bool = False,
+        timeout: float | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> HttpxResponse:
+        request = self.client.build_request(method, url, headers=headers, timeout=timeout)
+        response = HttpxResponse(self.client.send(request, stream=True, follow_redirects=allow_redirects))
+        if not stream:
+            response.content  # noqa: B018
+        return response
+
+    def get(self, url: str, **kwargs: object) -> HttpxResponse:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, *, allow_redirects: bool = False, **kwargs: object) -> HttpxResponse:
+        return self.request("HEAD", url, allow_redirects=allow_redirects, **kwargs)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_session(  # noqa: PLR0913
+    url: str,
+    backend: str = "requests",
+    jobs: int = 1,
+    retry: int = 0,
+    http_headers: dict[str, str] | None = None,
+    client_cert_p12: str | None = None,
+    client_cert_p12_password: str | None = None,
+    *,
+    http2: bool = False,
+    max_connections: int | None = None,
+) -> requests.Session | HttpxSession:
+    """Create the pooled HTTP session used to dump url with the selected backend."""
+    if backend not in HTTP_BACKENDS:
+        msg = f"Unknown HTTP backend {backend!r}, expected one of {', '.join(HTTP_BACKENDS)}"
+        raise ValueError(msg)
+
+    # one pooled connection per worker unless told otherwise
+    pool_size = max(1, max_connections or jobs)
+
+    if backend == "httpx":
+        ssl_context = None
+        if client_cert_p12:
+            ssl_context = Pkcs12Adapter(
+                pkcs12_filename=client_cert_p12,
+                pkcs12_password=client_cert_p12_password,
+            ).ssl_context
+        return HttpxSession(
+            headers=http_headers,
+            retries=retry,
+            max_connections=pool_size,
+            http2=http2,
+            ssl_context=ssl_context,
+        )
+
+    session = requests.Session()
+    session.verify = False
+    session.headers = http_headers
+    if client_cert_p12:
+        session.mount(
+            url,
+            Pkcs12Adapter(
+                pkcs12_filename=client_cert_p12,
+                pkcs12_password=client_cert_p12_password,
+                pool_connections=pool_size,
+                pool_maxsize=pool_size,
+            ),
+        )
+    else:
+        session.mount(
+            url,
+            requests.adapters.HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size),
+        )
+    return session
@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from utils.shaset import ShaSet
+
+# pending tasks read from the database per query when loading a frontier
+LOAD_PAGE_SIZE = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS phases (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    phase TEXT NOT NULL,
+    task TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (phase, task)
+);
+CREATE TABLE IF NOT EXISTS validators (
+    path TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+);
+"""
+
+
+class CrawlJournal:
+    """On-disk record of a dump so that a retried fetch_git resumes where it stopped.
+
+    For every phase it keeps the frontier (pending tasks) and the seen-set (done
+    tasks), plus which phases are already complete. Writes are batched and
+    committed at most every `commit_interval` seconds; a crash loses at most
+    that much progress, and the lost tasks are simply processed again.
+
+    The HTTP validators (status, ETag, Last-Modified) of the fetched files are
+    kept as well, so that a refresh of the dump can send conditional requests.
+    Validators are written by the dumper threads, hence the lock.
+    """
+
+    def __init__(self, path: str | Path, commit_interval: float = 1.0) -> None:
+        """Open or create the journal database at path."""
+        self.path = str(path)
+        self.commit_interval = commit_interval
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self._last_commit = time.monotonic()
+
+    def _maybe_commit(self) -> None:
+        if time.monotonic() - self._last_commit >= self.commit_interval:
+            self.commit()
+
+    def commit(self) -> None:
+        with self._lock:
+            self.db.commit()
+            self._last_commit = time.monotonic()
+
+    def is_phase_done(self, phase: str) -> bool:
+        with self._lock:
+            return self.db.execute("SELECT 1 FROM phases WHERE name = ?", (phase,)).fetchone() is not None
+
+    def mark_phase_done(self, phase: str) -> None:
+        with self._lock:
+            self.db.execute("INSERT OR IGNORE INTO phases (name) VALUES (?)", (phase,))
+            self.commit()
+
+    def restart_phase(self, phase: str, *, keep_seen: bool = False) -> None:
+        """Make a completed phase run again, optionally keeping its seen-set."""
+        with self._lock:
+            self.db.execute("DELETE FROM phases WHERE name = ?", (phase,))
+            if not keep_seen:
+                self.db.execute("DELETE FROM tasks WHERE phase = ?", (phase,))
+            self.commit()
+
+    def add_tasks(self, phase: str, tasks: Iterable[str]) -> None:
+        """Add tasks to the frontier of a phase, ignoring the ones already known."""
+        with self._lock:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO tasks (phase, task) VALUES (?, ?)",
+                ((phase, task) for task in tasks),
+            )
+            self._maybe_commit()
+
+    def complete_task(self, phase: str, task: str, new_tasks: Iterable[str]) -> None:
+        """Record that task was processed and queue the tasks it discovered."""
+        with self._lock:
+            self.add_tasks(phase, new_tasks)
+            self.db.execute(
+                "INSERT INTO tasks (phase, task, done) VALUES (?, ?, 1) "
+                "ON CONFLICT (phase, task) DO UPDATE SET done = 1",
+                (phase, task),
+            )
+            self._maybe_commit()
+
+    def load(
+        self,
+        phase: str,
+        seen: set[str] | ShaSet | None = None,
+    ) -> tuple[set[str] | ShaSet, Iterator[str]]:
+        """Return the seen-set and the frontier recorded for a phase.
+
+        The done tasks are added to `seen` when given, a new set otherwise. The
+        frontier is an iterator reading the pending tasks from the database
+        LOAD_PAGE_SIZE at a time, so a huge one is never held in a list.
+        """
+        seen = set() if seen is None else seen
+        with self._lock:
+            done = self.db.execute("SELECT task FROM tasks WHERE phase = ? AND done = 1", (phase,))
+            seen.update(task for (task,) in done)
+        return seen, self._iter_pending(phase)
+
+    def _iter_pending(self, phase: str) -> Iterator[str]:
+        last = ""
+        while True:
+            with self._lock:
+                page = self.db.execute(
+                    "SELECT task FROM tasks WHERE phase = ? AND done = 0 AND task > ? ORDER BY task LIMIT ?",
+                    (phase, last, LOAD_PAGE_SIZE),
+                ).fetchall()
+            yield from (task for (task,) in page)
+            if len(page) < LOAD_PAGE_SIZE:
+                return
+            last = page[-1][0]
+
+    def get_validator(self, path: str) -> tuple[int, str | None, str | None] | None:
+        """Return the (status, ETag, Last-Modified) last seen for path, or None."""
+        with self._lock:
+            return self.db.execute(
+                "SELECT status, etag, last_modified FROM validators WHERE path = ?",
+                (path,),
+            ).fetchone()
+
+    def set_validator(
+        self,
+        path: str,
+        status: int,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO validators (path, status, etag, last_modified) VALUES (?, ?, ?, ?)",
+                (path, status, etag, last_modified),
+            )
+            self._maybe_commit()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.db.execute("DELETE FROM phases")
+            self.db.execute("DELETE FROM tasks")
+            self.db.execute("DELETE FROM validators")
+            self.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.commit()
+            self.db.close()
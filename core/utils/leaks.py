@@ -1,79 +1,263 @@
+import hashlib
 import json
 import os
 import shutil
 import subprocess
+import tempfile
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any
 
+import dulwich.repo
 
-def run_gitleaks(repo_path):
+from utils.scan_cache import ScanCache
+
+CACHE_VERSION = 2
+
+# exit codes of gitleaks run with --exit-code 2
+GITLEAKS_ERROR = 1
+GITLEAKS_LEAKS_FOUND = 2
+GITLEAKS_UNKNOWN_FLAG = 126
+
+
+def run_gitleaks_command(command: list[str | Path], report_path: Path) -> list[dict[str, Any]]:
+    """Run one gitleaks pass and return its findings."""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, check=False)  # noqa: S603
+        if result.returncode == 0:
+            # No leaks present
+            return []
+        if result.returncode == GITLEAKS_ERROR:
+            print("Error")
+            return []
+        elif result.returncode == GITLEAKS_LEAKS_FOUND:
+            # Leaks encountered, try to read the report
+            try:
+                with report_path.open() as report_file:
+                    return json.load(report_file)
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                print(f"Error reading or decoding JSON from report file {report_path}: {e}")
+        elif result.returncode == GITLEAKS_UNKNOWN_FLAG:
+            print(f"Unknown flag encountered in command: {command}")
+        else:
+            print(f"Unexpected return code {result.returncode} for command: {command}")
+    except subprocess.CalledProcessError as e:
+        print(f"Error running Gitleaks with command {command}: {e.stderr}")
+    return []
+
+
+def load_cache(cache_path: str) -> dict[str, Any]:
+    try:
+        with Path(cache_path).open() as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    if cache.get("version") != CACHE_VERSION:
+        cache = {"version": CACHE_VERSION, "tips": [], "commits": {}, "blobs": {}}
+    # the findings of a commit are kept as a set, a commit scanned twice does not duplicate them
+    cache["commits"] = {commit: set(findings) for commit, findings in cache["commits"].items()}
+    return cache
+
+
+def save_cache(cache_path: str, cache: dict[str, Any]) -> None:
+    part_path = Path(cache_path + ".part")
+    with part_path.open("w") as f:
+        json.dump({**cache, "commits": {commit: sorted(findings) for commit, findings in cache["commits"].items()}}, f)
+    part_path.replace(cache_path)
+
+
+def get_ref_tips(repo_path: str) -> set[str]:
+    """Return the commits pointed to by HEAD and the refs that are present in the dump."""
+    try:
+        repo = dulwich.repo.Repo(repo_path)
+        refs = repo.get_refs()
+    except Exception:  # noqa: BLE001
+        return set()
+
+    with repo:
+        return {sha.decode() for sha in refs.values() if sha in repo.object_store and repo[sha].type_name == b"commit"}
+
+
+def hash_blob(path: Path) -> str:
+    """Return the git blob SHA1 of a file."""
+    sha = hashlib.sha1(b"blob %d\0" % path.stat().st_size, usedforsecurity=False)
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def hash_files(repo_path: str) -> dict[str, str]:
+    """Return {relative path: blob SHA1} for the files of the working tree under repo_path."""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(repo_path):
+        if dirpath == str(repo_path):
+            # the history is scanned by the git pass
+            dirnames[:] = [dirname for dirname in dirnames if dirname != ".git"]
+        for filename in filenames:
+            path = Path(dirpath, filename)
+            if path.is_file() and not path.is_symlink():
+                files[os.path.relpath(path, repo_path)] = hash_blob(path)
+    return files
+
+
+def link_files(repo_path: str, relpaths: Iterable[str], target: Path) -> None:
+    """Mirror the given files of repo_path under target, hardlinking when possible."""
+    for relpath in relpaths:
+        source = Path(repo_path, relpath)
+        destination = target / relpath
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            destination.hardlink_to(source)
+        except OSError:
+            shutil.copy2(source, destination)
+
+
+def get_gitleaks_ruleset() -> str | None:
+    """Return the ScanCache ruleset of the gitleaks files pass, None if the gitleaks version is unknown."""
+    gitleaks = shutil.which("gitleaks")
+    if gitleaks is None:
+        return None
+    result = subprocess.run([gitleaks, "version"], capture_output=True, text=True, check=False)  # noqa: S603
+    version = result.stdout.strip()
+    if result.returncode != 0 or not version:
+        return None
+    return f"gitleaks-{version}"
+
+
+def file_key(relpath: str, blob: str) -> str:
+    """Return the ScanCache key of the gitleaks findings of a file.
+
+    The allowlists of gitleaks match paths (vendor/, lockfiles...), so its
+    findings depend on the path of a blob as well as its content. Vendored
+    files sit at the same path in every target that ships them.
+    """
+    return hashlib.sha1(f"{relpath}\0{blob}".encode(), usedforsecurity=False).hexdigest()
+
+
+def get_shared_findings(
+    scan_cache: ScanCache,
+    ruleset: str,
+    files: dict[str, str],
+    relpaths: Iterable[str],
+) -> dict[str, list[dict[str, Any]]]:
+    """Return {blob SHA1: findings} for the files already scanned with ruleset, in this dump or any other."""
+    keys = {file_key(relpath, files[relpath]): relpath for relpath in relpaths}
+    return {files[keys[key]]: findings for key, findings in scan_cache.get_many(keys, ruleset).items()}
+
+
+def run_gitleaks(
+    repo_path: str,
+    cache_path: str | None = None,
+    scan_cache: ScanCache | None = None,
+) -> list[dict[str, Any]]:
+    """Scan the dump with gitleaks, in git mode and in --no-git mode concurrently.
+
+    Findings are cached next to the dump, per commit for the git pass and per
+    blob SHA1 for the files pass, so a rescan of a refreshed dump only looks at
+    the commits reachable from new ref tips and at files whose content changed.
+    With a ScanCache, the files pass also skips the files scanned by the same
+    gitleaks version in any other dump.
+    """
     # Проверка, что Gitleaks установлен
     if not shutil.which("gitleaks"):
         raise EnvironmentError("Gitleaks is not installed or not found in PATH")
 
-    # Создание выходной директории, если не существует
-    # Path(repo_path).mkdir(parents=True, exist_ok=True)
-
-    # # Команды для запуска Gitleaks с указанием путей к отчетам
-    report_git = os.path.join(repo_path, "report_git.json")
-    report_no_git = os.path.join(repo_path, "report_no_git.json")
-    command_git = [
-        "gitleaks",
-        "detect",
-        "--source",
-        repo_path,
-        "--report-format",
-        "json",
-        "--report-path",
-        report_git,
-        "--no-banner",
-        "--exit-code",
-        "2",
-    ]
-    command_no_git = [
-        "gitleaks",
-        "detect",
-        "--source",
-        repo_path,
-        "--report-format",
-        "json",
-        "--report-path",
-        report_no_git,
-        "--no-banner",
-        "--no-git",
-        "--exit-code",
-        "2",
-    ]
-
-    all_findings = []
-
-    for command, report_path in [(command_git, report_git), (command_no_git, report_no_git)]:
-        try:
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode == 0:
-                # No leaks present
-                continue
-            if result.returncode == 1:
-                print("Error")
-                continue
-            elif result.returncode == 2:
-                # Leaks encountered, try to read the report
-                try:
-                    with open(report_path, "r") as report_file:
-                        report = json.load(report_file)
-                        all_findings.extend(report)
-                except (FileNotFoundError, json.JSONDecodeError) as e:
-                    print(f"Error reading or decoding JSON from report file {report_path}: {e}")
-            elif result.returncode == 126:
-                print(f"Unknown flag encountered in command: {command}")
-            else:
-                print(f"Unexpected return code {result.returncode} for command: {command}")
-        except subprocess.CalledProcessError as e:
-            print(f"Error running Gitleaks with command {command}: {e.stderr}")
+    if cache_path is None:
+        cache_path = str(repo_path).rstrip("/") + ".gitleaks.json"
+    cache = load_cache(cache_path)
+
+    tips = get_ref_tips(repo_path)
+    new_tips = tips - set(cache["tips"])
+    files = hash_files(repo_path)
+    changed_files = [relpath for relpath, blob in files.items() if blob not in cache["blobs"]]
+
+    # a .gitleaks.toml of the target replaces the rules of the files pass
+    ruleset = None
+    if scan_cache is not None and not Path(repo_path, ".gitleaks.toml").exists():
+        ruleset = get_gitleaks_ruleset()
+    if ruleset is not None:
+        cache["blobs"].update(get_shared_findings(scan_cache, ruleset, files, changed_files))
+        changed_files = [relpath for relpath in changed_files if files[relpath] not in cache["blobs"]]
+
+    # next to the dump, on its filesystem, so that the changed files are hardlinked rather than copied
+    with tempfile.TemporaryDirectory(prefix=".gitleaks-", dir=Path(repo_path).absolute().parent) as tmpdir:
+        # Отчеты пишутся вне сканируемой директории
+        report_git = Path(tmpdir, "report_git.json")
+        report_no_git = Path(tmpdir, "report_no_git.json")
+        changed_dir = Path(tmpdir, "changed")
+        link_files(repo_path, changed_files, changed_dir)
+
+        command_git = [
+            "gitleaks",
+            "detect",
+            "--source",
+            repo_path,
+            "--report-format",
+            "json",
+            "--report-path",
+            report_git,
+            "--no-banner",
+            "--exit-code",
+            "2",
+        ]
+        if cache["tips"] and tips:
+            # only the commits that were not reachable at the last scan
+            command_git += ["--log-opts", " ".join(["--full-history", "--all", "--not", *sorted(cache["tips"])])]
+        command_no_git = [
+            "gitleaks",
+            "detect",
+            "--source",
+            changed_dir,
+            "--report-format",
+            "json",
+            "--report-path",
+            report_no_git,
+            "--no-banner",
+            "--no-git",
+            "--exit-code",
+            "2",
+        ]
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            # without any resolved tip there is nothing to compare with, the whole history is scanned
+            scan_history = bool(new_tips) or not tips
+            git_future = executor.submit(run_gitleaks_command, command_git, report_git) if scan_history else None
+            no_git_future = (
+                executor.submit(run_gitleaks_command, command_no_git, report_no_git) if changed_files else None
+            )
+            git_findings = git_future.result() if git_future else []
+            no_git_findings = no_git_future.result() if no_git_future else []
+
+    for finding in git_findings:
+        cache["commits"].setdefault(finding.get("Commit", ""), set()).add(json.dumps(finding, sort_keys=True))
+    cache["tips"] = sorted(set(cache["tips"]) | tips)
+
+    # forget the blobs that are gone from the dump
+    cache["blobs"] = {blob: cache["blobs"].get(blob, []) for blob in set(files.values())}
+    for finding in no_git_findings:
+        relpath = os.path.relpath(changed_dir / finding["File"], changed_dir)
+        if relpath in files:
+            finding["File"] = relpath
+            cache["blobs"][files[relpath]].append(finding)
+    if ruleset is not None:
+        scan_cache.put_many(
+            ((file_key(relpath, files[relpath]), cache["blobs"][files[relpath]]) for relpath in changed_files),
+            ruleset,
+        )
+
+    save_cache(cache_path, cache)
+
+    all_findings = [json.loads(finding) for findings in cache["commits"].values() for finding in findings]
+    all_findings.extend(
+        {**finding, "File": str(Path(repo_path) / relpath)}
+        for relpath, blob in files.items()
+        for finding in cache["blobs"].get(blob, [])
+    )
 
     # Удаление дубликатов
-    unique_findings = {
-        f"{finding['File']}{finding['Secret']}{finding['RuleID']}": finding for finding in all_findings
-    }
+    unique_findings = {f"{finding['File']}{finding['Secret']}{finding['RuleID']}": finding for finding in all_findings}
 
     return list(unique_findings.values())
 
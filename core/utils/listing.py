@@ -0,0 +1,67 @@
+import html
+import re
+import urllib.parse
+
+import bs4
+
+# entries of the autoindex pages, always written as a bare <a href="...">
+ENTRY_LINK = re.compile(rb'<a href="([^"]+)">', re.IGNORECASE)
+
+# (flavour, Server header token, markers of its index page)
+LISTING_FLAVOURS = (
+    ("apache", "apache", (b"<title>Index of ", b"<address>Apache")),
+    ("nginx", "nginx", (b"<h1>Index of ", b"<hr><pre>")),
+    ("iis", "microsoft-iis", (b"<pre><A HREF=", b"[To Parent Directory]")),
+    ("python", "simplehttp", (b"<title>Directory listing for ",)),
+)
+
+
+def detect_flavour(content: bytes, server: str = "") -> str | None:
+    """Return the web server that generated the directory index, or None for an unknown page."""
+    server = server.lower()
+    head = content[:4096]
+    for flavour, token, markers in LISTING_FLAVOURS:
+        if token in server and any(marker in head for marker in markers):
+            return flavour
+    for flavour, _, markers in LISTING_FLAVOURS:
+        if all(marker in head for marker in markers):
+            return flavour
+    return None
+
+
+def resolve_href(href: str, base_url: str) -> str | None:
+    """Return href relative to the listed directory, or None if it points outside of it.
+
+    Parent and self links ("../", "./", "sub/../") resolve to the directory
+    or above it and are dropped like any other link outside of it.
+    """
+    if "&" in href:
+        href = html.unescape(href)
+    if href.startswith(("?", "#")):  # column sorting
+        return None
+
+    # IIS links every entry with an absolute path
+    absolute = urllib.parse.urljoin(base_url, href)
+    if not absolute.startswith(base_url) or absolute == base_url:
+        return None
+    return absolute[len(base_url) :].split("?", 1)[0].split("#", 1)[0] or None
+
+
+def parse_listing(content: bytes, base_url: str, server: str = "") -> tuple[str | None, list[str]]:
+    """Return the flavour of a directory index page and the entries it links to.
+
+    Known autoindex formats are parsed with a single regex over the raw bytes;
+    anything else goes through BeautifulSoup.
+    """
+    if not base_url.endswith("/"):
+        base_url += "/"
+
+    flavour = detect_flavour(content, server)
+    if flavour is not None:
+        hrefs = [href.decode(errors="replace") for href in ENTRY_LINK.findall(content)]
+    else:
+        page = bs4.BeautifulSoup(content, "html.parser")
+        hrefs = [link.get("href") for link in page.find_all("a") if link.get("href")]
+
+    entries = (resolve_href(href, base_url) for href in hrefs)
+    return flavour, list(dict.fromkeys(entry for entry in entries if entry))
@@ -0,0 +1,147 @@
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from utils.http import HttpSession, Response
+
+# celery prefork children write to PROMETHEUS_MULTIPROC_DIR, aggregated at scrape time
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    # the metrics below open their files in it as soon as they are created;
+    # the files of a previous run are removed by the worker entrypoint
+    Path(MULTIPROC_DIR).mkdir(parents=True, exist_ok=True)
+
+PHASE_DURATION = Histogram(
+    "git_dump_phase_duration_seconds",
+    "Time spent in each phase of a dump",
+    ["phase"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+REQUEST_DURATION = Histogram(
+    "git_dump_request_duration_seconds",
+    "Time until the response headers of a dumper request were received",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+RESPONSE_SIZE = Histogram(
+    "git_dump_response_size_bytes",
+    "Body size of the dumper responses",
+    buckets=(0, 128, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864),
+)
+RESPONSES = Counter("git_dump_responses_total", "Dumper responses by status code", ["status"])
+REJECTED_RESPONSES = Counter(
+    "git_dump_rejected_responses_total",
+    "Responses rejected by verify_response, by reason",
+    ["reason"],
+)
+FRONTIER_SIZE = Gauge(
+    "git_dump_frontier_size",
+    "Tasks waiting in the frontier of a phase",
+    ["phase"],
+    multiprocess_mode="livesum",
+)
+DUMPS = Counter("git_dump_tasks_total", "Finished dumps by status", ["status"])
+
+
+def get_registry(path: str | None = None) -> CollectorRegistry:
+    """Return the registry to expose, aggregating every process writing to path in multiprocess mode."""
+    path = path or MULTIPROC_DIR
+    if not path:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    return registry
+
+
+def render_metrics(path: str) -> tuple[bytes, str]:
+    """Return the exposition of the metrics the worker processes write to path, and its content type.
+
+    The API only reads the files: setting PROMETHEUS_MULTIPROC_DIR in its own
+    container would make it write files named after pids that clash with the
+    worker's.
+    """
+    Path(path).mkdir(parents=True, exist_ok=True)
+    return generate_latest(get_registry(path)), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int) -> None:
+    """Serve the metrics of this process and of its children on port."""
+    start_http_server(port, registry=get_registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+class MetricsResponse:
+    """Response proxy observing the body size once it was read and closed."""
+
+    def __init__(self, response: Response) -> None:
+        """Wrap a streamed response."""
+        self._response = response
+        self._size = 0
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        for chunk in self._response.iter_content(chunk_size):
+            self._size += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._response.close()
+        finally:
+            if self._size:
+                RESPONSE_SIZE.observe(self._size)
+                self._size = 0
+
+
+class MetricsSession:
+    """Session wrapper recording the latency, status and size of every response."""
+
+    def __init__(self, session: HttpSession) -> None:
+        """Wrap session."""
+        self.session = session
+
+    def get(self, url: str, **kwargs: object) -> Response | MetricsResponse:
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+        except Exception as e:
+            RESPONSES.labels(status=type(e).__name__).inc()
+            raise
+        REQUEST_DURATION.observe(time.perf_counter() - start)
+        RESPONSES.labels(status=str(response.status_code)).inc()
+        if not kwargs.get("stream"):
+            RESPONSE_SIZE.observe(len(response.content))
+            return response
+        return MetricsResponse(response)
+
+    def head(self, url: str, **kwargs: object) -> Response:
+        start = time.perf_counter()
+        try:
+            response = self.session.head(url, **kwargs)
+        except Exception as e:
+            RESPONSES.labels(status=type(e).__name__).inc()
+            raise
+        REQUEST_DURATION.observe(time.perf_counter() - start)
+        RESPONSES.labels(status=str(response.status_code)).inc()
+        return response
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,121 @@
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO usage (id, size) VALUES (1, 0);
+"""
+
+
+def link_or_copy(source: str | Path, destination: str | Path) -> None:
+    """Hardlink source to destination, copying when they are on different filesystems."""
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    part_path = destination.with_name(destination.name + ".part")
+    try:
+        part_path.hardlink_to(source)
+    except FileExistsError:
+        part_path.unlink()
+        part_path.hardlink_to(source)
+    except OSError:
+        shutil.copyfile(source, part_path)
+    part_path.replace(destination)
+
+
+class SharedObjectStore:
+    """Content-addressed store of git objects and packs shared by every dump of a worker.
+
+    Loose objects are keyed by their SHA1 and packs and pack indexes by their
+    SHA1 trailer and extension, never by the name the server gave them. Files are hardlinked in and out of the per-task
+    .git directories, and the least recently used entries are evicted once the
+    store grows beyond quota_bytes. The counters tell how many bytes and
+    requests a dump saved by reusing stored files.
+    """
+
+    def __init__(self, root: str | Path, quota_bytes: int) -> None:
+        """Open the store at root, creating it if needed."""
+        self.root = Path(root).absolute()
+        self.quota_bytes = quota_bytes
+        self.bytes_saved = 0
+        self.requests_saved = 0
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        # shared by the dumper threads and by the worker processes
+        self.db = sqlite3.connect(self.root / "index.sqlite", timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def _path(self, key: str) -> Path:
+        if key.endswith((".pack", ".idx")):
+            return self.root / "packs" / key
+        return self.root / "objects" / key[:2] / key[2:]
+
+    def fetch(self, key: str, destination: str | Path) -> bool:
+        """Link the stored file for key to destination, return False if it is not stored."""
+        path = self._path(key)
+        with self._lock:
+            row = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not path.is_file():
+                return False
+            self.db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            self.bytes_saved += row[0]
+            self.requests_saved += 1
+
+        link_or_copy(path, destination)
+        return True
+
+    def add(self, key: str, source: str | Path) -> None:
+        """Store the file at source under key."""
+        path = self._path(key)
+        with self._lock:
+            if self.db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None:
+                return
+
+        size = Path(source).stat().st_size
+        link_or_copy(source, path)
+        with self._lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                (key, size, time.time()),
+            )
+            if cursor.rowcount:
+                self.db.execute("UPDATE usage SET size = size + ? WHERE id = 1", (size,))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self) -> None:
+        (total,) = self.db.execute("SELECT size FROM usage WHERE id = 1").fetchone()
+        if total <= self.quota_bytes:
+            return
+
+        evicted = []
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.quota_bytes:
+                break
+            evicted.append((key, size))
+            total -= size
+
+        for key, _ in evicted:
+            self._path(key).unlink(missing_ok=True)
+        self.db.executemany("DELETE FROM entries WHERE key = ?", ((key,) for key, _ in evicted))
+        self.db.execute("UPDATE usage SET size = size - ? WHERE id = 1", (sum(size for _, size in evicted),))
+
+    def stats(self) -> dict[str, int]:
+        return {"bytes_saved": self.bytes_saved, "requests_saved": self.requests_saved}
+
+    def close(self) -> None:
+        self.db.close()
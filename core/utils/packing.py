@@ -0,0 +1,105 @@
+import hashlib
+import os
+import re
+import zlib
+from pathlib import Path
+
+import dulwich.errors
+import dulwich.objects
+import dulwich.pack
+
+LOOSE_OBJECT_DIR = re.compile(r"^[0-9a-f]{2}$")
+LOOSE_OBJECT_NAME = re.compile(r"^[0-9a-f]{38}$")
+
+
+def find_loose_objects(objects_dir: Path) -> list[tuple[str, Path]]:
+    """Return the (SHA1, path) of every loose object in the objects directory."""
+    objs = []
+    for dirpath in sorted(objects_dir.iterdir()):
+        if not LOOSE_OBJECT_DIR.match(dirpath.name) or not dirpath.is_dir():
+            continue
+        objs.extend(
+            (dirpath.name + path.name, path) for path in dirpath.iterdir() if LOOSE_OBJECT_NAME.match(path.name)
+        )
+    return objs
+
+
+def write_pack(pack_dir: Path, objs: list[tuple[str, Path]]) -> set[str]:
+    """Write the given loose objects into a new pack and its .idx.
+
+    Objects are inflated and written one at a time; only the index entries
+    (SHA1, offset, CRC32) are kept in memory. Unreadable objects are left out.
+    Return the SHA1 of the objects that were packed.
+    """
+    tmp_pack_path = pack_dir / f"tmp_pack_{os.getpid()}"
+    tmp_idx_path = pack_dir / f"tmp_idx_{os.getpid()}"
+    entries = []
+
+    with tmp_pack_path.open("w+b") as f:
+        dulwich.pack.write_pack_header(f.write, len(objs))
+        for sha, path in objs:
+            try:
+                obj_file = dulwich.objects.ShaFile.from_path(str(path))
+            except (OSError, ValueError, zlib.error, dulwich.errors.ObjectFormatException):
+                continue
+            offset = f.tell()
+            crc32 = dulwich.pack.write_pack_object(f.write, obj_file.type_num, obj_file.as_raw_string())
+            entries.append((bytes.fromhex(sha), offset, crc32))
+
+        if not entries:
+            f.close()
+            tmp_pack_path.unlink()
+            return set()
+        if len(entries) != len(objs):
+            f.seek(0)
+            dulwich.pack.write_pack_header(f.write, len(entries))
+
+        # the trailer is the SHA1 of everything before it
+        f.seek(0)
+        checksum = hashlib.sha1(usedforsecurity=False)
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(chunk)
+        pack_checksum = checksum.digest()
+        f.write(pack_checksum)
+
+    entries.sort()
+    with tmp_idx_path.open("wb") as f:
+        dulwich.pack.write_pack_index(f, entries, pack_checksum)
+
+    # the .idx is moved last, packs are only picked up once it exists
+    basename = f"pack-{pack_checksum.hex()}"
+    tmp_pack_path.replace(pack_dir / f"{basename}.pack")
+    tmp_idx_path.replace(pack_dir / f"{basename}.idx")
+    return {sha.hex() for sha, _, _ in entries}
+
+
+def pack_loose_objects(directory: str, max_pack_objects: int = 100_000) -> int:
+    """Move the loose objects of the dump into packfiles of at most max_pack_objects objects.
+
+    Loose files are only removed once the pack holding them is complete, so an
+    interrupted run leaves the repository readable and can simply be repeated.
+    Return the number of objects packed.
+    """
+    objects_dir = Path(directory, ".git", "objects")
+    if not objects_dir.is_dir():
+        return 0
+
+    pack_dir = objects_dir / "pack"
+    pack_dir.mkdir(parents=True, exist_ok=True)
+
+    packed = 0
+    objs = find_loose_objects(objects_dir)
+    for start in range(0, len(objs), max_pack_objects):
+        batch = objs[start : start + max_pack_objects]
+        packed_objs = write_pack(pack_dir, batch)
+        for sha, path in batch:
+            if sha in packed_objs:
+                path.unlink()
+        packed += len(packed_objs)
+
+    # drop the now empty fan-out directories
+    for dirpath in objects_dir.iterdir():
+        if LOOSE_OBJECT_DIR.match(dirpath.name) and dirpath.is_dir() and not any(dirpath.iterdir()):
+            dirpath.rmdir()
+
+    return packed
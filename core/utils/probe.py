@@ -0,0 +1,111 @@
+import hashlib
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from utils.http import HttpSession, Response
+from utils.metrics import REJECTED_RESPONSES
+
+# paths that cannot exist, at the depths the candidates live at
+PROBE_PATHS = (".git/{}", ".git/refs/heads/{}", ".git/hooks/{}.sample")
+
+
+def body_signature(body: bytes, path: str) -> tuple[int, int, str]:
+    """Return the length and hash of a body, with the echoed request path removed.
+
+    Catch-all pages often repeat the requested URL, which would give every
+    miss a different body.
+    """
+    count = 0
+    for echoed in dict.fromkeys((path.encode(), urllib.parse.quote(path).encode())):
+        count += body.count(echoed)
+        body = body.replace(echoed, b"")
+    return len(body), count, hashlib.sha256(body).hexdigest()
+
+
+class NotFoundFingerprint:
+    """How a server answers paths that do not exist.
+
+    A server answering them with a 404 needs no probing. One answering 200
+    serves a soft 404 page, recognized by its status, length and body hash.
+    """
+
+    def __init__(self) -> None:
+        """Start without any probe response."""
+        self.statuses: set[int] = set()
+        self.signatures: set[tuple[int, int, int, str]] = set()
+        self.content_types: set[str] = set()
+
+    @property
+    def soft(self) -> bool:
+        return HTTPStatus.OK in self.statuses
+
+    def add(self, response: Response, path: str) -> None:
+        self.statuses.add(response.status_code)
+        self.content_types.add(response.headers.get("Content-Type", "").split(";")[0].strip())
+        self.signatures.add((response.status_code, *body_signature(response.content, path)))
+
+    def is_miss(self, response: Response, path: str) -> bool:
+        """Return True if a GET response is the not-found page."""
+        if response.status_code != HTTPStatus.OK:
+            return True
+        length, _, digest = body_signature(response.content, path)
+        return any(
+            status == HTTPStatus.OK and (base, signature) == (length, digest)
+            for status, base, _, signature in self.signatures
+        )
+
+    def is_head_miss(self, response: Response, path: str) -> bool | None:
+        """Return True or False if a HEAD response is enough to tell a miss, None otherwise."""
+        if response.status_code != HTTPStatus.OK:
+            return True
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type == "text/html" and content_type in self.content_types:
+            return True
+        if "Content-Length" not in response.headers:
+            return None
+        # the not-found page with this path echoed count times
+        length = int(response.headers["Content-Length"])
+        for status, base, count, _ in self.signatures:
+            if status == HTTPStatus.OK and length == base + count * len(path):
+                return None
+        return False
+
+
+def fingerprint_not_found(session: HttpSession, url: str, timeout: float) -> NotFoundFingerprint:
+    """Request a few random paths and return the NotFoundFingerprint of the server."""
+    fingerprint = NotFoundFingerprint()
+    for template in PROBE_PATHS:
+        path = template.format(uuid.uuid4().hex)
+        response = session.get(f"{url}/{path}", allow_redirects=False, timeout=timeout)
+        fingerprint.add(response, path)
+    return fingerprint
+
+
+def probe_path(session: HttpSession, path: str, url: str, timeout: float, fingerprint: NotFoundFingerprint) -> bool:
+    """Return True if path exists, with a HEAD request when it is enough to tell."""
+    response = session.head(f"{url}/{path}", allow_redirects=False, timeout=timeout)
+    miss = None
+    if response.status_code not in (HTTPStatus.METHOD_NOT_ALLOWED, HTTPStatus.NOT_IMPLEMENTED):
+        miss = fingerprint.is_head_miss(response, path)
+    if miss is None:
+        response = session.get(f"{url}/{path}", allow_redirects=False, timeout=timeout)
+        miss = fingerprint.is_miss(response, path)
+    if miss and response.status_code == HTTPStatus.OK:
+        REJECTED_RESPONSES.labels(reason="soft_404").inc()
+    return not miss
+
+
+def probe_paths(  # noqa: PLR0913
+    session: HttpSession,
+    paths: list[str],
+    url: str,
+    timeout: float,
+    fingerprint: NotFoundFingerprint,
+    jobs: int = 1,
+) -> list[str]:
+    """Return the paths that exist on a server answering missing paths with a soft 404."""
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        found = executor.map(lambda path: probe_path(session, path, url, timeout, fingerprint), paths)
+        return [path for path, exists in zip(paths, found, strict=True) if exists]
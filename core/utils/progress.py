@@ -0,0 +1,226 @@
+import json
+import sys
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Sized
+from typing import Any
+
+import redis
+import redis.asyncio
+
+from utils.http import HttpSession, Response
+
+# snapshots outlive the task so late subscribers still see how it ended
+SNAPSHOT_TTL = 24 * 60 * 60
+# SSE comment sent when nothing happened, keeps proxies from closing the stream
+HEARTBEAT_INTERVAL = 15.0
+
+# a task being retried publishes again under the same id, so "retry" is not final
+FINAL_PHASES = ("success", "error")
+
+
+def progress_key(task_id: str) -> str:
+    return f"progress:{task_id}"
+
+
+class ProgressReporter:
+    """Publish the progress of a dump to Redis, as a snapshot key and a pub/sub message.
+
+    Counters are updated by the dumper threads and published at most every
+    `interval` seconds. Without a reachable Redis the counters are kept but
+    nothing is published.
+    """
+
+    def __init__(self, task_id: str, redis_url: str | None, interval: float = 1.0) -> None:
+        """Start counting, publishing to the Redis at redis_url if any."""
+        self.task_id = task_id
+        self.key = progress_key(task_id)
+        self.interval = interval
+        self.redis = redis.Redis.from_url(redis_url, socket_timeout=5, socket_connect_timeout=5) if redis_url else None
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.phase = "starting"
+        self.phase_started = self.started
+        self.discovered = 0
+        self.processed = 0
+        self.fetched = 0
+        self.failed = 0
+        self.bytes = 0
+        self.requests = 0
+        self._last_publish = 0.0
+        self._last_requests = 0
+
+    def set_phase(self, phase: str, discovered: int = 0) -> None:
+        with self._lock:
+            self.phase = phase
+            self.phase_started = time.monotonic()
+            self.discovered = discovered
+            self.processed = 0
+        self.publish(force=True)
+
+    def task_done(self, new_tasks: Sized) -> None:
+        with self._lock:
+            self.processed += 1
+            self.discovered += len(new_tasks)
+        self.publish()
+
+    def response(self, status_code: int) -> None:
+        with self._lock:
+            self.requests += 1
+            if status_code in (200, 304):
+                self.fetched += 1
+            else:
+                self.failed += 1
+        self.publish()
+
+    def add_bytes(self, count: int) -> None:
+        with self._lock:
+            self.bytes += count
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        elapsed = now - self.phase_started
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.discovered - self.processed)
+        since_publish = now - self._last_publish if self._last_publish else now - self.started
+        return {
+            "task_id": self.task_id,
+            "phase": self.phase,
+            "discovered": self.discovered,
+            "processed": self.processed,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "requests": self.requests,
+            "rps": round((self.requests - self._last_requests) / since_publish, 2) if since_publish > 0 else 0.0,
+            "eta": round(remaining / rate, 1) if rate > 0 else None,
+            "elapsed": round(now - self.started, 1),
+            "finished": self.phase in FINAL_PHASES,
+        }
+
+    def publish(self, *, force: bool = False) -> None:
+        if self.redis is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_publish < self.interval:
+                return
+            message = json.dumps(self.snapshot())
+            self._last_publish = now
+            self._last_requests = self.requests
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(self.key, message, ex=SNAPSHOT_TTL)
+            pipe.publish(self.key, message)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(f"Progress publishing disabled, Redis is unavailable: {e}", file=sys.stderr)
+            self.redis = None
+
+    def finish(self, status: str) -> None:
+        self.set_phase(status)
+
+    def close(self) -> None:
+        if self.redis is not None:
+            self.redis.close()
+
+
+class ProgressResponse:
+    """Response proxy counting the bytes read from the body."""
+
+    def __init__(self, response: Response, reporter: ProgressReporter) -> None:
+        """Wrap a streamed response, reporting its body to reporter."""
+        self._response = response
+        self._reporter = reporter
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        for chunk in self._response.iter_content(chunk_size):
+            self._reporter.add_bytes(len(chunk))
+            yield chunk
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class ProgressSession:
+    """Session wrapper reporting every response to a ProgressReporter."""
+
+    def __init__(self, session: HttpSession, reporter: ProgressReporter) -> None:
+        """Wrap session, reporting its responses to reporter."""
+        self.session = session
+        self.reporter = reporter
+
+    def get(self, url: str, **kwargs: object) -> Response | ProgressResponse:
+        response = self.session.get(url, **kwargs)
+        self.reporter.response(response.status_code)
+        if not kwargs.get("stream"):
+            self.reporter.add_bytes(len(response.content))
+            return response
+        return ProgressResponse(response, self.reporter)
+
+    def head(self, url: str, **kwargs: object) -> Response:
+        response = self.session.head(url, **kwargs)
+        self.reporter.response(response.status_code)
+        return response
+
+    def close(self) -> None:
+        self.session.close()
+
+
+async def has_progress(redis_url: str, task_id: str) -> bool:
+    """Return True if a progress snapshot of the task is stored."""
+    client = redis.asyncio.Redis.from_url(redis_url)
+    try:
+        return bool(await client.exists(progress_key(task_id)))
+    finally:
+        await client.aclose()
+
+
+async def stream_progress(
+    redis_url: str,
+    task_id: str | None = None,
+    wait_timeout: float | None = None,
+) -> AsyncIterator[str]:
+    """Yield the progress of one task, or of every task, as Server-Sent Events.
+
+    The current snapshot is sent first, then every published update. The
+    stream of a single task ends once it is finished, or after wait_timeout
+    seconds if the task never published anything.
+    """
+    client = redis.asyncio.Redis.from_url(redis_url)
+    pubsub = client.pubsub()
+    deadline = None
+    try:
+        if task_id is not None:
+            await pubsub.subscribe(progress_key(task_id))
+            snapshot = await client.get(progress_key(task_id))
+            if snapshot is not None:
+                yield f"data: {snapshot.decode()}\n\n"
+                if json.loads(snapshot)["finished"]:
+                    return
+            elif wait_timeout is not None:
+                deadline = time.monotonic() + wait_timeout
+        else:
+            await pubsub.psubscribe(progress_key("*"))
+
+        while True:
+            timeout = HEARTBEAT_INTERVAL
+            if deadline is not None:
+                timeout = max(0.0, min(timeout, deadline - time.monotonic()))
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+            if message is None:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                yield ": heartbeat\n\n"
+                continue
+            deadline = None
+            data = message["data"].decode()
+            yield f"data: {data}\n\n"
+            if task_id is not None and json.loads(data)["finished"]:
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
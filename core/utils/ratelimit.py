@@ -0,0 +1,260 @@
+import random
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import redis
+
+from utils.http import HttpSession, Response
+
+# KEYS: bucket, in-flight leases, backoff
+# ARGV: rate (tokens/s), burst, max in flight, key ttl (ms), lease id, lease ttl (ms)
+# Return 0 when a slot was taken, the milliseconds to wait otherwise.
+# Every slot is a lease id scored with its deadline, so the slot of a killed
+# worker is freed once its lease expires instead of leaking.
+ACQUIRE_SCRIPT = """
+local backoff = redis.call('PTTL', KEYS[3])
+if backoff > 0 then
+    return backoff
+end
+
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[3]) then
+    return -1
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+if tokens < 1 then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], ARGV[4])
+    return math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[6]), ARGV[5])
+redis.call('PEXPIRE', KEYS[2], math.max(tonumber(ARGV[4]), tonumber(ARGV[6])))
+return 0
+"""
+
+# statuses meaning the host wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+# poll interval while every in-flight slot of a host is taken
+IN_FLIGHT_POLL = 0.05
+
+
+class HostThrottled(Exception):  # noqa: N818
+    """The host stayed saturated for longer than the limiter is allowed to wait."""
+
+    def __init__(self, host: str, retry_after: float) -> None:
+        """Record the host and the seconds it asked us to wait."""
+        super().__init__(f"{host} is rate limited, retry in {retry_after:.1f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the seconds to wait from a Retry-After header, given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class HostLimiter:
+    """Per-host token bucket and in-flight cap shared by every worker through Redis.
+
+    Each host gets `rate` requests per second with bursts of `burst`, and at
+    most `max_in_flight` concurrent requests across the cluster. A request
+    holds its slot for at most `lease_ttl` seconds, so the slots of a killed
+    worker come back on their own. A 429 or 503 pauses the host for its
+    Retry-After, or for an exponential backoff that grows with consecutive
+    throttled responses.
+
+    The limits do not scale with the `jobs` of a dump: once the burst is spent,
+    all the workers of every dump of a host share `rate` requests per second.
+
+    When Redis can not be reached the limiter lets every request through.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        url: str,
+        rate: float = 10.0,
+        burst: int = 20,
+        max_in_flight: int = 10,
+        max_wait: float = 30.0,
+        max_backoff: float = 300.0,
+        lease_ttl: float = 600.0,
+    ) -> None:
+        """Connect to the Redis at url, where the limits of every host are kept."""
+        self.redis = redis.Redis.from_url(url, socket_timeout=5, socket_connect_timeout=5)
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.max_backoff = max_backoff
+        self.lease_ttl = int(lease_ttl * 1000)
+        self.key_ttl = int(max(60.0, burst / rate, max_backoff) * 1000)
+        self.disabled = False
+        self._lock = threading.Lock()
+        self._acquire = self.redis.register_script(ACQUIRE_SCRIPT)
+
+    def _keys(self, host: str) -> tuple[str, str, str]:
+        # the hash tag keeps the keys of a host on one Redis Cluster slot
+        return f"ratelimit:{{{host}}}:bucket", f"ratelimit:{{{host}}}:leases", f"ratelimit:{{{host}}}:backoff"
+
+    def _disable(self, e: redis.RedisError) -> None:
+        with self._lock:
+            if not self.disabled:
+                print(f"Rate limiter disabled, Redis is unavailable: {e}", file=sys.stderr)
+            self.disabled = True
+
+    def acquire(self, host: str) -> str | None:
+        """Wait for a request slot on host and return its lease id, None when the limiter is disabled.
+
+        Raise HostThrottled if it takes longer than max_wait.
+        """
+        deadline = time.monotonic() + self.max_wait
+        lease = uuid.uuid4().hex
+        while not self.disabled:
+            try:
+                wait = self._acquire(
+                    keys=self._keys(host),
+                    args=[self.rate, self.burst, self.max_in_flight, self.key_ttl, lease, self.lease_ttl],
+                )
+            except redis.RedisError as e:
+                self._disable(e)
+                return None
+            if wait == 0:
+                return lease
+
+            wait = IN_FLIGHT_POLL if wait < 0 else wait / 1000
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                raise HostThrottled(host, wait)
+            # jitter so that waiting workers do not wake up all at once
+            time.sleep(wait * random.uniform(1.0, 1.2))  # noqa: S311
+        return None
+
+    def release(self, host: str, lease: str | None) -> None:
+        if self.disabled or lease is None:
+            return
+        try:
+            self.redis.zrem(self._keys(host)[1], lease)
+        except redis.RedisError as e:
+            self._disable(e)
+
+    def observe(self, host: str, response: Response) -> None:
+        """Back off the host when it answers with a throttling status."""
+        if self.disabled or response.status_code not in THROTTLE_STATUSES:
+            return
+
+        bucket_key, _, backoff_key = self._keys(host)
+        strikes_key = f"ratelimit:{{{host}}}:strikes"
+        try:
+            strikes = self.redis.incr(strikes_key)
+            self.redis.pexpire(strikes_key, self.key_ttl)
+            backoff = parse_retry_after(response.headers.get("Retry-After"))
+            if backoff is None:
+                backoff = 2 ** min(strikes, 16)
+            backoff = min(backoff, self.max_backoff)
+            self.redis.set(backoff_key, 1, px=max(1, int(backoff * 1000)))
+            # start again from an empty bucket once the pause is over
+            self.redis.hset(bucket_key, mapping={"tokens": 0, "ts": int(time.time() * 1000 + backoff * 1000)})
+        except redis.RedisError as e:
+            self._disable(e)
+
+    def close(self) -> None:
+        self.redis.close()
+
+
+class ThrottledResponse:
+    """Response proxy releasing the in-flight slot of its host once closed."""
+
+    def __init__(self, response: Response, release: Callable[[], None] | None) -> None:
+        """Wrap a streamed response, calling release when it is closed."""
+        self._response = response
+        self._release = release
+
+    def __getattr__(self, name: str) -> object:
+        return getattr(self._response, name)
+
+    def close(self) -> None:
+        try:
+            self._response.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class ThrottledSession:
+    """Session wrapper that asks the HostLimiter before every request.
+
+    Throttled responses are retried up to `retries` times once the host
+    backoff is over.
+    """
+
+    def __init__(self, session: HttpSession, limiter: HostLimiter, retries: int = 3) -> None:
+        """Wrap session, throttling its requests with limiter."""
+        self.session = session
+        self.limiter = limiter
+        self.retries = retries
+
+    def get(self, url: str, **kwargs: object) -> Response | ThrottledResponse:
+        return self.request(self.session.get, url, **kwargs)
+
+    def head(self, url: str, **kwargs: object) -> Response | ThrottledResponse:
+        return self.request(self.session.head, url, **kwargs)
+
+    def request(
+        self,
+        send: Callable[..., Response],
+        url: str,
+        **kwargs: object,
+    ) -> Response | ThrottledResponse:
+        host = urllib.parse.urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            lease = self.limiter.acquire(host)
+            try:
+                response = send(url, **kwargs)
+            except Exception:
+                self.limiter.release(host, lease)
+                raise
+
+            self.limiter.observe(host, response)
+            if response.status_code not in THROTTLE_STATUSES or attempt == self.retries:
+                break
+            response.close()
+            self.limiter.release(host, lease)
+
+        if not kwargs.get("stream"):
+            self.limiter.release(host, lease)
+            return response
+        return ThrottledResponse(response, lambda: self.limiter.release(host, lease))
+
+    def close(self) -> None:
+        self.session.close()
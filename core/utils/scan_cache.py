@@ -0,0 +1,122 @@
+import json
+import sqlite3
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT NOT NULL,
+    ruleset TEXT NOT NULL,
+    matches TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (sha, ruleset)
+);
+CREATE INDEX IF NOT EXISTS ix_blobs_last_used ON blobs (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# sqlite limits the number of host parameters of a statement
+BATCH_SIZE = 500
+
+
+class ScanCache:
+    """Content-addressed cache of secret scan results shared by every dump of a worker.
+
+    Entries are keyed by blob SHA1 and rule-set version, so identical blobs
+    (vendored libraries, lockfiles...) are scanned once across all targets.
+    The least recently used entries are evicted beyond max_entries.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 1_000_000) -> None:
+        """Open or create the cache database at path."""
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        Path(self.path).absolute().parent.mkdir(parents=True, exist_ok=True)
+        # the cache is shared by the worker processes
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        # the entries are counted as they are added and evicted, caches created without the counter are counted once
+        self.db.execute("INSERT OR IGNORE INTO counters (name, value) SELECT 'entries', COUNT(*) FROM blobs")
+        self.db.commit()
+
+    def get_many(self, shas: Iterable[bytes | str], ruleset: str) -> dict[bytes | str, list[dict[str, Any]]]:
+        """Return {sha: matches} for the blobs already scanned with ruleset."""
+        shas = list(shas)
+        found = {}
+        for start in range(0, len(shas), BATCH_SIZE):
+            batch = {sha.decode() if isinstance(sha, bytes) else sha: sha for sha in shas[start : start + BATCH_SIZE]}
+            rows = self.db.execute(
+                f"SELECT sha, matches FROM blobs WHERE ruleset = ? AND sha IN ({','.join('?' * len(batch))})",  # noqa: S608
+                (ruleset, *batch),
+            )
+            for sha, matches in rows:
+                found[batch[sha]] = json.loads(matches)
+
+        now = time.time()
+        self.db.executemany(
+            "UPDATE blobs SET last_used = ? WHERE sha = ? AND ruleset = ?",
+            ((now, sha.decode() if isinstance(sha, bytes) else sha, ruleset) for sha in found),
+        )
+        self._count(hits=len(found), misses=len(shas) - len(found))
+        self.db.commit()
+        return found
+
+    def put_many(self, results: Iterable[tuple[bytes | str, list[dict[str, Any]]]], ruleset: str) -> None:
+        """Store [(sha, matches)] scanned with ruleset and evict the least recently used entries."""
+        now = time.time()
+        # a blob scanned with the same ruleset has the same matches, one stored by another worker is kept
+        added = self.db.executemany(
+            "INSERT OR IGNORE INTO blobs (sha, ruleset, matches, last_used) VALUES (?, ?, ?, ?)",
+            (
+                (sha.decode() if isinstance(sha, bytes) else sha, ruleset, json.dumps(matches), now)
+                for sha, matches in results
+            ),
+        ).rowcount
+        count = self._add_entries(added)
+        if count > self.max_entries:
+            evicted = self.db.execute(
+                "DELETE FROM blobs WHERE rowid IN (SELECT rowid FROM blobs ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            ).rowcount
+            self._add_entries(-evicted)
+        self.db.commit()
+
+    def _add_entries(self, added: int) -> int:
+        """Add to the entry counter and return the number of entries."""
+        self.db.execute("UPDATE counters SET value = value + ? WHERE name = 'entries'", (added,))
+        (count,) = self.db.execute("SELECT value FROM counters WHERE name = 'entries'").fetchone()
+        return count
+
+    def _count(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+        self.db.executemany(
+            "INSERT INTO counters (name, value) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + ?",
+            (("hits", hits, hits), ("misses", misses, misses)),
+        )
+
+    def stats(self) -> dict[str, int | float]:
+        """Return the hit/miss counters of this instance and of the whole cache."""
+        counters = dict(self.db.execute("SELECT name, value FROM counters"))
+        total_hits = counters.get("hits", 0)
+        total_misses = counters.get("misses", 0)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0.0,
+            "total_hits": total_hits,
+            "total_misses": total_misses,
+            "total_hit_ratio": total_hits / (total_hits + total_misses) if total_hits + total_misses else 0.0,
+            "entries": counters.get("entries", 0),
+        }
+
+    def close(self) -> None:
+        self.db.close()
@@ -0,0 +1,446 @@
+import hashlib
+import math
+import re
+import stat
+import zlib
+from collections import Counter
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO
+
+import billiard
+import dulwich.index
+import dulwich.object_store
+import dulwich.objects
+import dulwich.pack
+import dulwich.repo
+
+from utils.scan_cache import ScanCache
+
+# Subset of the gitleaks default rules: (RuleID, Description, keywords, regex, minimum entropy)
+# The first group of the regex, if any, is the secret.
+RULES = [
+    (
+        "aws-access-token",
+        "AWS Access Key ID",
+        ["akia", "asia", "abia", "acca"],
+        rb"\b((?:A3T[A-Z0-9]|AKIA|ASIA|ABIA|ACCA)[A-Z0-9]{16})\b",
+        0,
+    ),
+    (
+        "private-key",
+        "Private Key",
+        ["-----begin"],
+        rb"(-----BEGIN[ A-Z0-9_-]{0,100}PRIVATE KEY(?: BLOCK)?-----[\s\S-]{64,}?KEY(?: BLOCK)?-----)",
+        0,
+    ),
+    ("github-pat", "GitHub Personal Access Token", ["ghp_"], rb"\b(ghp_[0-9a-zA-Z]{36})\b", 0),
+    ("github-fine-grained-pat", "GitHub Fine-Grained PAT", ["github_pat_"], rb"\b(github_pat_\w{82})\b", 0),
+    ("github-oauth", "GitHub OAuth Access Token", ["gho_"], rb"\b(gho_[0-9a-zA-Z]{36})\b", 0),
+    ("github-app-token", "GitHub App Token", ["ghu_", "ghs_"], rb"\b((?:ghu|ghs)_[0-9a-zA-Z]{36})\b", 0),
+    ("gitlab-pat", "GitLab Personal Access Token", ["glpat-"], rb"\b(glpat-[0-9a-zA-Z\-_]{20})\b", 0),
+    ("slack-bot-token", "Slack Bot Token", ["xoxb"], rb"\b(xoxb-[0-9]{10,13}-[0-9]{10,13}[a-zA-Z0-9-]*)\b", 0),
+    (
+        "slack-user-token",
+        "Slack User Token",
+        ["xoxp-", "xoxe-"],
+        rb"\b(xox[pe](?:-[0-9]{10,13}){3}-[a-zA-Z0-9-]{28,34})\b",
+        0,
+    ),
+    (
+        "slack-webhook-url",
+        "Slack Webhook",
+        ["hooks.slack.com"],
+        rb"(https?://hooks\.slack\.com/(?:services|workflows)/[A-Za-z0-9+/]{43,46})",
+        0,
+    ),
+    ("gcp-api-key", "GCP API key", ["aiza"], rb"\b(AIza[0-9A-Za-z\-_]{35})\b", 0),
+    (
+        "stripe-access-token",
+        "Stripe Access Token",
+        ["sk_test", "sk_live", "pk_test", "pk_live"],
+        rb"\b((?:sk|pk)_(?:test|live)_[0-9a-zA-Z]{10,99})\b",
+        0,
+    ),
+    ("sendgrid-api-token", "SendGrid API token", ["sg."], rb"\b(SG\.[a-zA-Z0-9=_\-\.]{66})\b", 0),
+    ("npm-access-token", "npm access token", ["npm_"], rb"\b(npm_[a-zA-Z0-9]{36})\b", 0),
+    (
+        "jwt",
+        "JSON Web Token",
+        ["ey"],
+        rb"\b(ey[a-zA-Z0-9]{17,}\.ey[a-zA-Z0-9/\\_-]{17,}\.(?:[a-zA-Z0-9/\\_-]{10,}={0,2})?)",
+        3,
+    ),
+    (
+        "generic-api-key",
+        "Generic API Key",
+        ["key", "api", "token", "secret", "client", "passwd", "password", "auth", "access"],
+        rb"(?i)(?:key|api|token|secret|client|passwd|password|auth|access)(?:[0-9a-z\-_\t .]{0,20})"
+        rb"(?:[\s|']|[\s|\"]){0,3}(?:=|>|:{1,3}=|\|\|:|<=|=>|:|\?=)(?:'|\"|\s|=|\x60){0,5}"
+        rb"([0-9a-z\-_.=]{10,150})(?:['|\"|\n|\r|\s|\x60|;]|$)",
+        3.5,
+    ),
+]
+
+# all rule keywords compiled into one matcher, run before any rule regex
+KEYWORDS = re.compile(
+    b"|".join(
+        re.escape(keyword.encode())
+        for keyword in sorted({keyword for rule in RULES for keyword in rule[2]}, key=len, reverse=True)
+    ),
+)
+COMPILED_RULES = [
+    (rule_id, description, set(keywords), re.compile(regex), min_entropy)
+    for rule_id, description, keywords, regex, min_entropy in RULES
+]
+
+MAX_BLOB_SIZE = 10 * 1024 * 1024
+
+# changes whenever a rule or the size limit changes, so cached scan results are never reused across rule sets
+RULESET_VERSION = hashlib.sha1(repr((RULES, MAX_BLOB_SIZE)).encode(), usedforsecurity=False).hexdigest()[:12]
+CHUNK_SIZE = 256
+
+_repo = None
+
+
+def shannon_entropy(data: bytes) -> float:
+    if not data:
+        return 0.0
+    counts = Counter(data)
+    return -sum(count / len(data) * math.log2(count / len(data)) for count in counts.values())
+
+
+def scan_content(data: bytes) -> list[tuple[str, str, int, int, bytes]]:
+    """Return (RuleID, Description, match start, match end, secret) for every secret in data."""
+    # binary files are skipped like gitleaks does
+    if b"\0" in data[:8000]:
+        return []
+
+    found_keywords = {m.group().decode() for m in KEYWORDS.finditer(data.lower())}
+    if not found_keywords:
+        return []
+
+    results = []
+    for rule_id, description, keywords, regex, min_entropy in COMPILED_RULES:
+        if keywords.isdisjoint(found_keywords):
+            continue
+        for match in regex.finditer(data):
+            group = 1 if match.re.groups else 0
+            secret = match.group(group)
+            if min_entropy and shannon_entropy(secret) < min_entropy:
+                continue
+            results.append((rule_id, description, match.start(), match.end(), secret))
+    return results
+
+
+def read_varint(data: bytes, i: int, shift: int = 0, value: int = 0) -> tuple[int, int]:
+    """Return the little-endian base-128 integer at data[i] and the offset after it."""
+    while True:
+        byte = data[i]
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        i += 1
+        if not byte & 0x80:
+            return value, i
+
+
+def inflate_head(f: BinaryIO, size: int) -> bytes:
+    """Return the first size bytes of the zlib stream read from f."""
+    # the huffman tables of a deflate block come before any output, so the input needed varies
+    decompressor = zlib.decompressobj()
+    head = b""
+    while len(head) < size and not decompressor.eof and (data := f.read(1024)):
+        head += decompressor.decompress(decompressor.unconsumed_tail + data, size - len(head))
+    return head
+
+
+def packed_object_size(f: BinaryIO, offset: int) -> int:
+    """Return the size of the object at offset in an open pack file, read from its header.
+
+    The header of a delta only gives the size of the delta, the size of the
+    object it builds is at the start of the compressed delta data.
+    """
+    f.seek(offset)
+    data = f.read(32)
+    type_num = (data[0] >> 4) & 7
+    size, i = data[0] & 0x0F, 1
+    if data[0] & 0x80:
+        size, i = read_varint(data, 1, 4, size)
+    if type_num not in (dulwich.pack.OFS_DELTA, dulwich.pack.REF_DELTA):
+        return size
+    if type_num == dulwich.pack.OFS_DELTA:
+        while data[i] & 0x80:
+            i += 1
+        i += 1
+    else:
+        i += 20
+    f.seek(offset + i)
+    delta = inflate_head(f, 20)
+    _, i = read_varint(delta, 0)
+    size, _ = read_varint(delta, i)
+    return size
+
+
+def object_size(
+    object_store: dulwich.object_store.DiskObjectStore,
+    sha: bytes,
+    pack_files: dict[str, BinaryIO],
+) -> int | None:
+    """Return the size of an object from its loose or pack header without inflating it, None if unknown.
+
+    pack_files caches the open pack files by path.
+    """
+    loose_path = Path(object_store.path, sha[:2].decode(), sha[2:].decode())
+    try:
+        with loose_path.open("rb") as f:
+            header = inflate_head(f, 64)
+        # "<type> <size>\0"
+        return int(header[: header.index(b"\0")].split(b" ")[1])
+    except FileNotFoundError:
+        pass
+    except (ValueError, IndexError, zlib.error):
+        return None
+
+    binsha = bytes.fromhex(sha.decode())
+    for pack in object_store.packs:
+        try:
+            offset = pack.index.object_offset(binsha)
+        except KeyError:
+            continue
+        filename = pack.data.path
+        if filename not in pack_files:
+            pack_files[filename] = Path(filename).open("rb")  # noqa: SIM115
+        try:
+            return packed_object_size(pack_files[filename], offset)
+        except (IndexError, zlib.error):
+            return None
+    return None
+
+
+def scan_blobs(repo_path: str, shas: list[bytes]) -> list[tuple[bytes, list[dict[str, Any]]]]:
+    """Scan blobs straight from the object store.
+
+    Return [(sha, matches)] where matches only depend on the blob content, so
+    they can be cached by SHA1 and shared by every path and commit holding it.
+    Blobs missing from the dump are left out.
+    """
+    global _repo  # noqa: PLW0603
+    if _repo is None or _repo.path != repo_path:
+        _repo = dulwich.repo.Repo(repo_path)
+
+    results = []
+    pack_files = {}
+    try:
+        for sha in shas:
+            result = scan_blob(sha, pack_files)
+            if result is not None:
+                results.append(result)
+    finally:
+        for f in pack_files.values():
+            f.close()
+    return results
+
+
+def scan_blob(sha: bytes, pack_files: dict[str, BinaryIO]) -> tuple[bytes, list[dict[str, Any]]] | None:
+    """Return (sha, matches) for one blob of the open repository, None if it is missing."""
+    # oversized blobs are skipped before they are inflated
+    size = object_size(_repo.object_store, sha, pack_files)
+    if size is not None and size > MAX_BLOB_SIZE:
+        return sha, []
+
+    try:
+        blob = _repo[sha]
+    except KeyError:
+        return None
+    if blob.type_name != b"blob" or blob.raw_length() > MAX_BLOB_SIZE:
+        return sha, []
+
+    data = blob.as_raw_string()
+    matches = []
+    for rule_id, description, start, end, secret in scan_content(data):
+        start_line = data.count(b"\n", 0, start) + 1
+        matches.append(
+            {
+                "Description": description,
+                "StartLine": start_line,
+                "EndLine": start_line + data.count(b"\n", start, end),
+                "StartColumn": start - data.rfind(b"\n", 0, start),
+                "EndColumn": end - data.rfind(b"\n", 0, end) - 1,
+                "Match": data[start:end].decode(errors="replace"),
+                "Secret": secret.decode(errors="replace"),
+                "Entropy": round(shannon_entropy(secret), 6),
+                "RuleID": rule_id,
+            },
+        )
+    return sha, matches
+
+
+def iter_tree_blobs(
+    repo: dulwich.repo.Repo,
+    tree_id: bytes,
+    seen_trees: set[bytes],
+    prefix: bytes = b"",
+) -> Iterator[tuple[bytes, bytes]]:
+    """Yield (sha, path) of the blobs under a tree, skipping trees already walked or missing."""
+    if tree_id in seen_trees:
+        return
+    seen_trees.add(tree_id)
+    try:
+        tree = repo[tree_id]
+    except KeyError:
+        return
+
+    for entry in tree.iteritems():
+        path = prefix + entry.path
+        if stat.S_ISDIR(entry.mode):
+            yield from iter_tree_blobs(repo, entry.sha, seen_trees, path + b"/")
+        elif stat.S_ISREG(entry.mode):
+            yield entry.sha, path
+
+
+def find_blobs(repo_path: str) -> tuple[dict[bytes, tuple[bytes, str]], dict[str, dulwich.objects.Commit]]:
+    """Map every blob reachable from the refs or the index to a (path, commit) it appears at.
+
+    Return that mapping together with the walked commits, keyed by SHA1.
+
+    Each blob is attributed to the first commit the walk finds it in, so identical
+    content is only scanned once however many commits and paths share it.
+    """
+    repo = dulwich.repo.Repo(repo_path)
+    blobs = {}
+    commits = {}
+    seen_trees = set()
+
+    pending = list(repo.get_refs().values())
+    seen_commits = set()
+    while pending:
+        sha = pending.pop()
+        if sha in seen_commits:
+            continue
+        seen_commits.add(sha)
+        try:
+            commit = repo[sha]
+        except KeyError:
+            continue
+        if commit.type_name == b"tag":
+            pending.append(commit.object[1])
+            continue
+        if commit.type_name != b"commit":
+            continue
+
+        commits[sha.decode()] = commit
+        pending.extend(commit.parents)
+        for blob_sha, path in iter_tree_blobs(repo, commit.tree, seen_trees):
+            blobs.setdefault(blob_sha, (path, sha.decode()))
+
+    index_path = Path(repo_path, ".git", "index")
+    if index_path.is_file():
+        for path, blob_sha, mode in dulwich.index.Index(str(index_path)).iterobjects():
+            if stat.S_ISREG(mode):
+                blobs.setdefault(blob_sha, (path, ""))
+
+    return blobs, commits
+
+
+def scan_chunks(
+    repo_path: str,
+    chunks: list[list[bytes]],
+    jobs: int | None,
+) -> list[tuple[bytes, list[dict[str, Any]]]]:
+    """Scan the chunks of blob SHA1s with scan_blobs, across a process pool unless jobs is 1."""
+    pool = None
+    if jobs != 1 and len(chunks) > 1:
+        try:
+            pool = billiard.Pool(processes=jobs)
+        except OSError as e:
+            # no processes left to fork, scan in this one
+            print(f"Scanning without a process pool: {e}")
+
+    scanned = []
+    if pool is None:
+        for chunk in chunks:
+            scanned.extend(scan_blobs(repo_path, chunk))
+        return scanned
+
+    try:
+        # one job per chunk, billiard workers wait at exit for the results of map jobs to be counted
+        results = [pool.apply_async(scan_blobs, (repo_path, chunk)) for chunk in chunks]
+        for result in results:
+            scanned.extend(result.get())
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return scanned
+
+
+def blob_findings(
+    matches: list[dict[str, Any]],
+    path: bytes,
+    commit_sha: str,
+    commit: dulwich.objects.Commit | None,
+) -> list[dict[str, Any]]:
+    """Turn the matches of a blob into gitleaks findings at the path and commit it was found in."""
+    file = path.decode(errors="replace")
+    author = email = date = message = ""
+    if commit is not None:
+        author, _, email = commit.author.decode(errors="replace").partition(" <")
+        email = email.rstrip(">")
+        date = datetime.fromtimestamp(commit.commit_time, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        message = commit.message.decode(errors="replace")
+
+    return [
+        {
+            **match,
+            "File": file,
+            "SymlinkFile": "",
+            "Commit": commit_sha,
+            "Author": author,
+            "Email": email,
+            "Date": date,
+            "Message": message,
+            "Tags": [],
+            "Fingerprint": f"{commit_sha}:{file}:{match['RuleID']}:{match['StartLine']}",
+        }
+        for match in matches
+    ]
+
+
+def scan_repository(
+    repo_path: str,
+    jobs: int | None = None,
+    cache: ScanCache | None = None,
+) -> list[dict[str, Any]]:
+    """Scan every blob of the dump for secrets without a working tree.
+
+    Blobs are read directly from the loose objects and packs and scanned across
+    a billiard process pool, which unlike multiprocessing can be started from
+    the daemonic celery prefork children. With a ScanCache, blobs already scanned with the current
+    rule set, in this dump or any other, are not scanned again.
+    Findings have the same shape as the gitleaks reports.
+    """
+    repo_path = str(Path(repo_path).absolute())
+    blobs, commits = find_blobs(repo_path)
+
+    matches = cache.get_many(blobs, RULESET_VERSION) if cache is not None else {}
+    shas = [sha for sha in blobs if sha not in matches]
+    chunks = [shas[i : i + CHUNK_SIZE] for i in range(0, len(shas), CHUNK_SIZE)]
+
+    scanned = scan_chunks(repo_path, chunks, jobs)
+
+    if cache is not None:
+        cache.put_many(scanned, RULESET_VERSION)
+    matches.update(scanned)
+
+    findings = []
+    for sha, blob_matches in matches.items():
+        path, commit_sha = blobs[sha]
+        findings.extend(blob_findings(blob_matches, path, commit_sha, commits.get(commit_sha)))
+
+    # Удаление дубликатов
+    unique_findings = {f"{finding['File']}{finding['Secret']}{finding['RuleID']}": finding for finding in findings}
+
+    return list(unique_findings.values())
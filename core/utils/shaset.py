@@ -0,0 +1,177 @@
+import os
+import tempfile
+from collections import deque
+from collections.abc import Container, Iterable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+DIGEST_SIZE = 20
+EMPTY = bytes(DIGEST_SIZE)
+MAX_LOAD = 0.6
+
+
+def to_digest(sha: str | bytes) -> bytes:
+    """Return the 20 bytes digest of a hex or binary SHA1."""
+    if isinstance(sha, str):
+        return bytes.fromhex(sha)
+    if len(sha) == 2 * DIGEST_SIZE:
+        return bytes.fromhex(sha.decode())
+    return bytes(sha)
+
+
+class ShaSet:
+    """Set of SHA1 stored as 20 bytes digests in one open-addressing table.
+
+    A str set of hex SHA1 costs well over 100 bytes per object; this costs
+    35 to 70 bytes depending on the load. SHA1 are uniformly distributed, so
+    their first bytes are used as the hash directly. Members are accepted as
+    hex str or bytes and iterated as hex str.
+    """
+
+    def __init__(self, shas: Iterable[str | bytes] = (), capacity: int = 1024) -> None:
+        """Create a set of shas with room for capacity members before it grows."""
+        size = 1
+        while size < capacity / MAX_LOAD:
+            size *= 2
+        self._table = bytearray(size * DIGEST_SIZE)
+        self._mask = size - 1
+        self._len = 0
+        # the null SHA1 marks the empty slots, so it is tracked on the side
+        self._has_empty = False
+        self.update(shas)
+
+    def _find(self, digest: bytes) -> int:
+        """Return the offset of digest in the table, or of the empty slot where it would go."""
+        table = self._table
+        slot = int.from_bytes(digest[:8], "big") & self._mask
+        while True:
+            offset = slot * DIGEST_SIZE
+            current = table[offset : offset + DIGEST_SIZE]
+            if current in (digest, EMPTY):
+                return offset
+            slot = (slot + 1) & self._mask
+
+    def _resize(self) -> None:
+        old = self._table
+        size = (self._mask + 1) * 2
+        self._table = bytearray(size * DIGEST_SIZE)
+        self._mask = size - 1
+        for offset in range(0, len(old), DIGEST_SIZE):
+            digest = old[offset : offset + DIGEST_SIZE]
+            if digest != EMPTY:
+                new_offset = self._find(digest)
+                self._table[new_offset : new_offset + DIGEST_SIZE] = digest
+
+    def add(self, sha: str | bytes) -> None:
+        digest = to_digest(sha)
+        if digest == EMPTY:
+            if not self._has_empty:
+                self._has_empty = True
+                self._len += 1
+            return
+
+        offset = self._find(digest)
+        if self._table[offset : offset + DIGEST_SIZE] == digest:
+            return
+        self._table[offset : offset + DIGEST_SIZE] = digest
+        self._len += 1
+        if self._len > MAX_LOAD * (self._mask + 1):
+            self._resize()
+
+    def update(self, shas: Iterable[str | bytes]) -> None:
+        for sha in shas:
+            self.add(sha)
+
+    def __contains__(self, sha: object) -> bool:
+        try:
+            digest = to_digest(sha)
+        except (ValueError, TypeError):
+            return False
+        if len(digest) != DIGEST_SIZE:
+            return False
+        if digest == EMPTY:
+            return self._has_empty
+        offset = self._find(digest)
+        return self._table[offset : offset + DIGEST_SIZE] == digest
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        if self._has_empty:
+            yield EMPTY.hex()
+        table = self._table
+        for offset in range(0, len(table), DIGEST_SIZE):
+            digest = table[offset : offset + DIGEST_SIZE]
+            if digest != EMPTY:
+                yield digest.hex()
+
+    def __sub__(self, other: Container[str]) -> "ShaSet":
+        return ShaSet((sha for sha in self if sha not in other), capacity=len(self))
+
+    def __ior__(self, other: Iterable[str | bytes]) -> "ShaSet":  # noqa: PYI034
+        self.update(other)
+        return self
+
+
+class SpillQueue:
+    """FIFO of str tasks keeping at most max_in_memory of them in memory.
+
+    Once full, new tasks are appended to a temporary file and read back in
+    order when the in-memory head runs out, so the frontier of a huge crawl
+    never holds millions of strings at once.
+    """
+
+    def __init__(self, tasks: Iterable[str] = (), max_in_memory: int = 1_000_000, directory: str | None = None) -> None:
+        """Queue tasks, spilling them to a temporary file in directory past max_in_memory."""
+        self.max_in_memory = max(1, max_in_memory)
+        self.directory = directory
+        self._head = deque()
+        self._spill: TextIO | None = None
+        self._spilled = 0
+        self.extend(tasks)
+
+    def append(self, task: str) -> None:
+        if self._spill is None and len(self._head) < self.max_in_memory:
+            self._head.append(task)
+            return
+        if self._spill is None:
+            fd, path = tempfile.mkstemp(prefix="frontier-", suffix=".txt", dir=self.directory)
+            # unlinked right away, the open file is removed whatever happens to the worker
+            Path(path).unlink()
+            self._spill = os.fdopen(fd, "w+", encoding="utf-8")
+            self._read_offset = 0
+        self._spill.seek(0, os.SEEK_END)
+        self._spill.write(task + "\n")
+        self._spilled += 1
+
+    def extend(self, tasks: Iterable[str]) -> None:
+        for task in tasks:
+            self.append(task)
+
+    def _refill(self) -> None:
+        self._spill.seek(self._read_offset)
+        while len(self._head) < self.max_in_memory and self._spilled:
+            line = self._spill.readline()
+            self._head.append(line[:-1])
+            self._spilled -= 1
+        self._read_offset = self._spill.tell()
+        if not self._spilled:
+            self._spill.close()
+            self._spill = None
+
+    def popleft(self) -> str:
+        if not self._head and self._spill is not None:
+            self._refill()
+        return self._head.popleft()
+
+    def __len__(self) -> int:
+        return len(self._head) + self._spilled
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
@@ -0,0 +1,87 @@
+from collections.abc import Iterable
+from typing import Any
+
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_shutdown
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session
+
+from core.config import settings
+from core.db import sync_engine
+from models.finding import Finding
+from models.task import Task
+from utils.findings import finding_row, iter_findings_artifact
+from utils.metrics import mark_process_dead, start_metrics_server
+
+# tasks that have a row in the tasks table
+TRACKED_TASKS = {"utils.git_dump.fetch_git"}
+
+# findings read from an artifact are inserted by batches of this size
+INSERT_BATCH_SIZE = 1000
+
+
+def get_task_values(state: str, retval: object) -> dict[str, Any]:
+    """Return the columns of a task row for the final state and the return value of its celery task."""
+    values = {"status": state}
+    if isinstance(retval, dict) and retval.get("status") == "success":
+        findings = retval.get("findings") or {}
+        values["path"] = retval.get("path")
+        values["findings_count"] = findings.get("count", 0)
+        values["findings_artifact"] = findings.get("artifact")
+    if isinstance(retval, dict) and retval.get("status", "").lower() == "error":
+        values["status"] = "ERROR"
+        values["result"] = retval["path"]
+    return values
+
+
+def update_task_row(task_id: str, values: dict[str, Any], leaks: Iterable[dict[str, Any]] | None = None) -> None:
+    """Update the row of a task and replace its findings in one transaction.
+
+    The findings of a previous delivery of the same task are deleted first,
+    celery may run a task twice.
+    """
+    with Session(sync_engine) as session:
+        session.execute(update(Task).where(Task.task_id == task_id).values(**values))
+        if leaks is not None:
+            session.execute(delete(Finding).where(Finding.task_id == task_id))
+            rows = []
+            for leak in leaks:
+                rows.append(finding_row(task_id, leak))
+                if len(rows) == INSERT_BATCH_SIZE:
+                    session.execute(insert(Finding), rows)
+                    rows = []
+            if rows:
+                session.execute(insert(Finding), rows)
+        session.commit()
+
+
+@task_prerun.connect
+def on_task_prerun(sender=None, task_id=None, **kwargs) -> None:  # noqa: ANN001, ANN003, ARG001
+    if sender.name in TRACKED_TASKS:
+        update_task_row(task_id, {"status": "STARTED"})
+
+
+@task_postrun.connect
+def on_task_postrun(sender=None, task_id=None, retval=None, state=None, **kwargs) -> None:  # noqa: ANN001, ANN003, ARG001
+    """Write the status, path and findings of a finished task once, instead of polling the result backend.
+
+    The findings are streamed from the artifact written by the task, they are
+    never part of the celery result.
+    """
+    if sender.name in TRACKED_TASKS:
+        leaks = None
+        if isinstance(retval, dict) and retval.get("status") == "success":
+            artifact = (retval.get("findings") or {}).get("artifact")
+            leaks = iter_findings_artifact(artifact) if artifact else ()
+        update_task_row(task_id, get_task_values(state, retval), leaks)
+
+
+@worker_init.connect
+def on_worker_init(**kwargs) -> None:  # noqa: ANN003, ARG001
+    """Expose the metrics of the worker and of its pool processes."""
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(pid=None, **kwargs) -> None:  # noqa: ANN001, ANN003, ARG001
+    mark_process_dead(pid)
@@ -1,36 +1,50 @@
-from celery.result import AsyncResult
 from fastapi import HTTPException
-from sqlmodel import select
+from sqlmodel import func, select
 
 from api.deps import SessionDep
+from models.finding import Finding
 from models.task import Task
-from utils.celery_worker import celery_app
 
+FINAL_STATES = ("SUCCESS", "ERROR", "FAILURE", "REVOKED")
 
-async def update_task_status(session: SessionDep, task_id: str):
-    task_result = AsyncResult(task_id, backend=celery_app.backend, app=celery_app)
+
+async def get_task(session: SessionDep, task_id: str) -> Task:
+    """Return the row of a task, kept up to date by the worker signals."""
     statement = select(Task).where(Task.task_id == task_id)
     result = await session.execute(statement)
     task_in_db: Task | None = result.scalar_one_or_none()
     if not task_in_db:
         raise HTTPException(status_code=404, detail="Task not found")
-
-    task_in_db.status = task_result.state
-    print(task_result.traceback)
-    print(task_result.info)
-    
-    if task_result.info and task_result.info["status"] == "success":
-        task_in_db.path = task_result.info["path"]
-        task_in_db.leaks = task_result.info["leaks"]
-    if task_result.info and task_result.info["status"].lower() == "error":
-        task_in_db.status = "ERROR"
-        task_in_db.result = task_result.info["path"]
-    session.add(task_in_db)
-    await session.commit()
-    await session.refresh(task_in_db)
     return task_in_db
 
 
-async def update_all_tasks_status(session: SessionDep, tasks: list[Task]) -> None:
-    for task in tasks:
-        await update_task_status(session, task.task_id)
+async def count_batch_statuses(session: SessionDep, batch_id: str) -> dict[str, int]:
+    """Count the tasks of a batch by status."""
+    statement = select(Task.status, func.count()).where(Task.batch_id == batch_id).group_by(Task.status)
+    result = await session.execute(statement)
+    return dict(result.all())
+
+
+async def get_findings_page(  # noqa: PLR0913
+    session: SessionDep,
+    task_id: str,
+    after: str | None = None,
+    limit: int = 100,
+    rule: str | None = None,
+    file: str | None = None,
+) -> tuple[list[Finding], str | None]:
+    """Return a page of the findings of a task after the `after` id, and the id to continue from."""
+    statement = select(Finding).where(Finding.task_id == task_id)
+    if rule:
+        statement = statement.where(Finding.rule_id == rule)
+    if file:
+        statement = statement.where(Finding.file == file)
+    if after:
+        statement = statement.where(Finding.id > after)
+    # one extra row tells whether there is a next page
+    statement = statement.order_by(Finding.id).limit(limit + 1)
+    result = await session.execute(statement)
+    findings = list(result.scalars().all())
+    if len(findings) > limit:
+        return findings[:limit], findings[limit - 1].id
+    return findings, None